@@ -0,0 +1,257 @@
+"""
+Native WiFi API access
+Thin ctypes wrapper around wlanapi.dll so the agent can read WiFi state
+without spawning netsh. Only available on Windows; check WLAN_AVAILABLE.
+"""
+
+import atexit
+import ctypes
+import threading
+from ctypes import wintypes
+from typing import List, Optional
+
+try:
+    _wlanapi = ctypes.WinDLL('wlanapi.dll')
+    WLAN_AVAILABLE = True
+except (AttributeError, OSError):
+    _wlanapi = None
+    WLAN_AVAILABLE = False
+
+ERROR_SUCCESS = 0
+ERROR_INVALID_STATE = 5023
+
+WLAN_CLIENT_VERSION = 2
+WLAN_INTF_OPCODE_CURRENT_CONNECTION = 7
+WLAN_INTERFACE_STATE_CONNECTED = 1
+WLAN_CONNECTION_MODE_PROFILE = 0
+DOT11_BSS_TYPE_INFRASTRUCTURE = 1
+
+
+class GUID(ctypes.Structure):
+    _fields_ = [
+        ('Data1', wintypes.DWORD),
+        ('Data2', wintypes.WORD),
+        ('Data3', wintypes.WORD),
+        ('Data4', ctypes.c_ubyte * 8),
+    ]
+
+
+class DOT11_SSID(ctypes.Structure):
+    _fields_ = [
+        ('uSSIDLength', wintypes.ULONG),
+        ('ucSSID', ctypes.c_ubyte * 32),
+    ]
+
+
+class WLAN_INTERFACE_INFO(ctypes.Structure):
+    _fields_ = [
+        ('InterfaceGuid', GUID),
+        ('strInterfaceDescription', wintypes.WCHAR * 256),
+        ('isState', wintypes.DWORD),
+    ]
+
+
+class WLAN_INTERFACE_INFO_LIST(ctypes.Structure):
+    _fields_ = [
+        ('dwNumberOfItems', wintypes.DWORD),
+        ('dwIndex', wintypes.DWORD),
+        ('InterfaceInfo', WLAN_INTERFACE_INFO * 1),
+    ]
+
+
+class WLAN_PROFILE_INFO(ctypes.Structure):
+    _fields_ = [
+        ('strProfileName', wintypes.WCHAR * 256),
+        ('dwFlags', wintypes.DWORD),
+    ]
+
+
+class WLAN_PROFILE_INFO_LIST(ctypes.Structure):
+    _fields_ = [
+        ('dwNumberOfItems', wintypes.DWORD),
+        ('dwIndex', wintypes.DWORD),
+        ('ProfileInfo', WLAN_PROFILE_INFO * 1),
+    ]
+
+
+class WLAN_ASSOCIATION_ATTRIBUTES(ctypes.Structure):
+    _fields_ = [
+        ('dot11Ssid', DOT11_SSID),
+        ('dot11BssType', wintypes.DWORD),
+        ('dot11Bssid', ctypes.c_ubyte * 6),
+        ('dot11PhyType', wintypes.DWORD),
+        ('uDot11PhyIndex', wintypes.ULONG),
+        ('wlanSignalQuality', wintypes.ULONG),
+        ('ulRxRate', wintypes.ULONG),
+        ('ulTxRate', wintypes.ULONG),
+    ]
+
+
+class WLAN_SECURITY_ATTRIBUTES(ctypes.Structure):
+    _fields_ = [
+        ('bSecurityEnabled', wintypes.BOOL),
+        ('bOneXEnabled', wintypes.BOOL),
+        ('dot11AuthAlgorithm', wintypes.DWORD),
+        ('dot11CipherAlgorithm', wintypes.DWORD),
+    ]
+
+
+class WLAN_CONNECTION_ATTRIBUTES(ctypes.Structure):
+    _fields_ = [
+        ('isState', wintypes.DWORD),
+        ('wlanConnectionMode', wintypes.DWORD),
+        ('strProfileName', wintypes.WCHAR * 256),
+        ('wlanAssociationAttributes', WLAN_ASSOCIATION_ATTRIBUTES),
+        ('wlanSecurityAttributes', WLAN_SECURITY_ATTRIBUTES),
+    ]
+
+
+class WLAN_CONNECTION_PARAMETERS(ctypes.Structure):
+    _fields_ = [
+        ('wlanConnectionMode', wintypes.DWORD),
+        ('strProfile', wintypes.LPCWSTR),
+        ('pDot11Ssid', ctypes.POINTER(DOT11_SSID)),
+        ('pDesiredBssidList', ctypes.c_void_p),
+        ('dot11BssType', wintypes.DWORD),
+        ('dwFlags', wintypes.DWORD),
+    ]
+
+
+if WLAN_AVAILABLE:
+    _wlanapi.WlanOpenHandle.argtypes = [wintypes.DWORD, ctypes.c_void_p,
+                                        ctypes.POINTER(wintypes.DWORD), ctypes.POINTER(wintypes.HANDLE)]
+    _wlanapi.WlanCloseHandle.argtypes = [wintypes.HANDLE, ctypes.c_void_p]
+    _wlanapi.WlanFreeMemory.argtypes = [ctypes.c_void_p]
+    _wlanapi.WlanFreeMemory.restype = None
+    _wlanapi.WlanEnumInterfaces.argtypes = [wintypes.HANDLE, ctypes.c_void_p,
+                                            ctypes.POINTER(ctypes.POINTER(WLAN_INTERFACE_INFO_LIST))]
+    _wlanapi.WlanGetProfileList.argtypes = [wintypes.HANDLE, ctypes.POINTER(GUID), ctypes.c_void_p,
+                                            ctypes.POINTER(ctypes.POINTER(WLAN_PROFILE_INFO_LIST))]
+    _wlanapi.WlanQueryInterface.argtypes = [wintypes.HANDLE, ctypes.POINTER(GUID), wintypes.DWORD,
+                                            ctypes.c_void_p, ctypes.POINTER(wintypes.DWORD),
+                                            ctypes.POINTER(ctypes.c_void_p), ctypes.c_void_p]
+    _wlanapi.WlanConnect.argtypes = [wintypes.HANDLE, ctypes.POINTER(GUID),
+                                     ctypes.POINTER(WLAN_CONNECTION_PARAMETERS), ctypes.c_void_p]
+
+_handle = None
+_handle_lock = threading.Lock()
+
+
+class WlanError(OSError):
+    """Raised when a WlanAPI call returns an error code."""
+
+
+def _check(result: int, call: str):
+    if result != ERROR_SUCCESS:
+        raise WlanError(result, f"{call} failed with error {result}")
+
+
+def _get_handle() -> wintypes.HANDLE:
+    """Open the WlanAPI client handle once and reuse it."""
+    global _handle
+    with _handle_lock:
+        if _handle is None:
+            negotiated = wintypes.DWORD()
+            handle = wintypes.HANDLE()
+            _check(_wlanapi.WlanOpenHandle(WLAN_CLIENT_VERSION, None,
+                                           ctypes.byref(negotiated), ctypes.byref(handle)),
+                   'WlanOpenHandle')
+            _handle = handle
+            atexit.register(_close_handle)
+        return _handle
+
+
+def _close_handle():
+    global _handle
+    with _handle_lock:
+        if _handle is not None:
+            _wlanapi.WlanCloseHandle(_handle, None)
+            _handle = None
+
+
+def _interfaces() -> List[WLAN_INTERFACE_INFO]:
+    """Return copies of the WiFi interfaces known to WlanAPI."""
+    info_list = ctypes.POINTER(WLAN_INTERFACE_INFO_LIST)()
+    _check(_wlanapi.WlanEnumInterfaces(_get_handle(), None, ctypes.byref(info_list)),
+           'WlanEnumInterfaces')
+    try:
+        count = info_list.contents.dwNumberOfItems
+        array = ctypes.cast(info_list.contents.InterfaceInfo,
+                            ctypes.POINTER(WLAN_INTERFACE_INFO * count)).contents
+        # Copy out before the list memory is freed
+        return [WLAN_INTERFACE_INFO.from_buffer_copy(info) for info in array]
+    finally:
+        _wlanapi.WlanFreeMemory(info_list)
+
+
+def _ssid_text(ssid: DOT11_SSID) -> str:
+    return bytes(ssid.ucSSID[:ssid.uSSIDLength]).decode('utf-8', errors='replace')
+
+
+def profile_names() -> List[str]:
+    """Return the names of the saved WiFi profiles on every interface."""
+    names = []
+    for info in _interfaces():
+        profile_list = ctypes.POINTER(WLAN_PROFILE_INFO_LIST)()
+        _check(_wlanapi.WlanGetProfileList(_get_handle(), ctypes.byref(info.InterfaceGuid), None,
+                                           ctypes.byref(profile_list)),
+               'WlanGetProfileList')
+        try:
+            count = profile_list.contents.dwNumberOfItems
+            array = ctypes.cast(profile_list.contents.ProfileInfo,
+                                ctypes.POINTER(WLAN_PROFILE_INFO * count)).contents
+            names.extend(profile.strProfileName for profile in array)
+        finally:
+            _wlanapi.WlanFreeMemory(profile_list)
+    return names
+
+
+def connected_ssids() -> List[str]:
+    """Return the SSID of every connected WiFi interface."""
+    ssids = []
+    for info in _interfaces():
+        if info.isState != WLAN_INTERFACE_STATE_CONNECTED:
+            continue
+        size = wintypes.DWORD()
+        data = ctypes.c_void_p()
+        result = _wlanapi.WlanQueryInterface(_get_handle(), ctypes.byref(info.InterfaceGuid),
+                                             WLAN_INTF_OPCODE_CURRENT_CONNECTION, None,
+                                             ctypes.byref(size), ctypes.byref(data), None)
+        if result == ERROR_INVALID_STATE:
+            # Disconnected between the enumeration and the query
+            continue
+        _check(result, 'WlanQueryInterface')
+        try:
+            attributes = ctypes.cast(data, ctypes.POINTER(WLAN_CONNECTION_ATTRIBUTES)).contents
+            ssids.append(_ssid_text(attributes.wlanAssociationAttributes.dot11Ssid))
+        finally:
+            _wlanapi.WlanFreeMemory(data)
+    return ssids
+
+
+def current_ssid() -> Optional[str]:
+    """Return the SSID of the first connected WiFi interface, if any."""
+    ssids = connected_ssids()
+    return ssids[0] if ssids else None
+
+
+def connect(profile_name: str):
+    """Ask the first WiFi interface to connect using a saved profile.
+
+    Like `netsh wlan connect`, this only starts the connection; poll
+    connected_ssids() to see when it is up.
+    """
+    interfaces = _interfaces()
+    if not interfaces:
+        raise WlanError(0, "No WiFi interface found")
+    params = WLAN_CONNECTION_PARAMETERS(
+        wlanConnectionMode=WLAN_CONNECTION_MODE_PROFILE,
+        strProfile=profile_name,
+        pDot11Ssid=None,
+        pDesiredBssidList=None,
+        dot11BssType=DOT11_BSS_TYPE_INFRASTRUCTURE,
+        dwFlags=0,
+    )
+    _check(_wlanapi.WlanConnect(_get_handle(), ctypes.byref(interfaces[0].InterfaceGuid),
+                                ctypes.byref(params), None),
+           'WlanConnect')
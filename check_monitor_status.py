@@ -9,6 +9,23 @@ import time
 import json
 from datetime import datetime
 
+# Separator between the timestamp and message of an INFO line in internet_monitor.log
+_INFO_SEP = b' - INFO - '
+
+def _tail_lines(path, n=5, block=8192):
+    """Return the last n lines of a file as bytes, reading backwards from the end."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        # Need more than n newlines so the oldest returned line is complete
+        while pos > 0 and data.count(b'\n') <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return data.splitlines()[-n:]
+
 def check_log_file():
     """Check the monitor log file for recent activity."""
     log_file = "internet_monitor.log"
@@ -17,34 +34,37 @@ def check_log_file():
         return "❌ Log file not found"
     
     try:
-        with open(log_file, 'r') as f:
-            lines = f.readlines()
+        # Only the tail is needed, so avoid reading the whole log
+        last_lines = _tail_lines(log_file, 5)
         
-        if not lines:
+        if not last_lines:
             return "❌ Log file is empty"
         
-        # Get last few lines
-        last_lines = lines[-5:]
-        last_activity = last_lines[-1].strip()
+        last_line = last_lines[-1].strip()
         
         # Extract timestamp from log line
-        if " - INFO - " in last_activity:
-            timestamp_str = last_activity.split(" - INFO - ")[0]
+        timestamp_bytes, sep, _ = last_line.partition(_INFO_SEP)
+        if sep:
             try:
-                # Parse timestamp
-                timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S,%f")
-                time_diff = datetime.now() - timestamp
+                # Slice the fixed "YYYY-MM-DD HH:MM:SS,mmm" logging format straight
+                # into epoch seconds; int() accepts the ASCII digits as bytes
+                s = timestamp_bytes
+                logged_at = time.mktime((int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                                         int(s[11:13]), int(s[14:16]), int(s[17:19]),
+                                         0, 0, -1)) + int(s[20:23]) / 1000.0
+                age = time.time() - logged_at
                 
-                if time_diff.total_seconds() < 60:  # Less than 1 minute ago
-                    return f"✅ Monitor active (last check: {time_diff.seconds}s ago)"
-                elif time_diff.total_seconds() < 300:  # Less than 5 minutes ago
-                    return f"⚠️  Monitor may be slow (last check: {time_diff.seconds}s ago)"
+                if age < 60:  # Less than 1 minute ago
+                    return f"✅ Monitor active (last check: {int(age)}s ago)"
+                elif age < 300:  # Less than 5 minutes ago
+                    return f"⚠️  Monitor may be slow (last check: {int(age)}s ago)"
                 else:
-                    return f"❌ Monitor appears stopped (last check: {time_diff.seconds}s ago)"
-            except:
-                return f"✅ Monitor running (last activity: {last_activity[:50]}...)"
-        else:
-            return f"✅ Monitor running (last activity: {last_activity[:50]}...)"
+                    return f"❌ Monitor appears stopped (last check: {int(age)}s ago)"
+            except (ValueError, OverflowError):
+                pass
+                
+        last_activity = last_line.decode('utf-8', errors='replace')
+        return f"✅ Monitor running (last activity: {last_activity[:50]}...)"
             
     except Exception as e:
         return f"❌ Error reading log: {e}"
@@ -79,9 +99,11 @@ def check_database():
     try:
         # Check if database is accessible
         import sqlite3
-        conn = sqlite3.connect(db_file)
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM connectivity_records")
+        # Events are never deleted, so the highest rowid equals the record count
+        # and is a single index seek rather than a full COUNT(*) scan
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM connectivity_events")
         count = cursor.fetchone()[0]
         conn.close()
         
@@ -4,16 +4,44 @@ Internet Connectivity Logbook
 Tracks internet disconnect and reconnect timestamps with detailed logging.
 """
 
+import atexit
 import json
 import logging
+import logging.handlers
 import os
+import re
 import sqlite3
+import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+# Stops netsh from flashing a console window on Windows (0 elsewhere)
+CREATE_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# "Profile : <name>" line of `netsh wlan show interfaces`
+_PROFILE_RE = re.compile(rb'^\s*Profile\s*:\s*(.+?)\s*$', re.MULTILINE)
+
+# netsh output is in the console's OEM code page; only the profile name is decoded
+NETSH_ENCODING = 'oem' if sys.platform == 'win32' else 'utf-8'
+
+# Text-record line for each event status
+_LINE_FMT = {
+    'DISCONNECTED': "[DISCONNECTED] {t} | Network: {n} | Error: {e}\n",
+    'RECONNECTED': "[RECONNECTED] {t} | Network: {n} | Downtime: {d} seconds\n",
+    'CONNECTED': "[CONNECTED] {t} | Network: {n}\n",
+}
+
+
+def _readable_time(timestamp: str) -> str:
+    """Turn an ISO 8601 timestamp into 'YYYY-MM-DD HH:MM:SS' by slicing."""
+    return timestamp[:10] + ' ' + timestamp[11:19]
 
 
 class InternetLogbook:
@@ -22,18 +50,52 @@ class InternetLogbook:
     def __init__(self, db_file: str = "internet_logbook.db"):
         """Initialize the logbook with SQLite database."""
         self.db_file = db_file
+        self.records_file = "internet_connectivity_records.txt"
         self.setup_logging()
+        # One long-lived connection avoids reopening the database file per call
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        atexit.register(self.close)
         self.setup_database()
         self.last_status = None
         self.last_check_time = None
         
+        # Events are buffered and written in batches by flush()
+        self.flush_batch_size = 32
+        self.flush_interval = 5
+        self._pending_events = []
+        self._pending_text = []
+        self._last_flush = 0.0
+        # Text-record appends run on one background thread, in submission order
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        
+        # Keep-alive session and worker pool shared by every connectivity probe
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self._probe_pool = ThreadPoolExecutor(max_workers=4)
+        
+        # The connected network rarely changes, so netsh is only re-run after this TTL
+        self.network_cache_ttl = 30
+        self._network_cache = (None, None)
+        
     def setup_logging(self):
         """Setup logging configuration."""
+        log_format = '%(asctime)s - %(levelname)s - %(message)s'
+        
+        # Buffer file writes; errors and interpreter shutdown flush the buffer
+        file_handler = logging.FileHandler('internet_logbook.log', encoding='utf-8', delay=True)
+        file_handler.setFormatter(logging.Formatter(log_format))
+        buffered_file_handler = logging.handlers.MemoryHandler(
+            capacity=200,
+            flushLevel=logging.ERROR,
+            target=file_handler,
+            flushOnClose=True
+        )
+        
         logging.basicConfig(
             level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
+            format=log_format,
             handlers=[
-                logging.FileHandler('internet_logbook.log'),
+                buffered_file_handler,
                 logging.StreamHandler(sys.stdout)
             ]
         )
@@ -42,8 +104,13 @@ class InternetLogbook:
     def setup_database(self):
         """Create SQLite database and tables."""
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
+            cursor = self._conn.cursor()
+            
+            # WAL lets readers run alongside the writer and, with synchronous=NORMAL,
+            # only syncs at checkpoints instead of on every commit
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute('PRAGMA busy_timeout=5000')
             
             # Create connectivity_events table
             cursor.execute('''
@@ -58,6 +125,12 @@ class InternetLogbook:
                 )
             ''')
             
+            # Index for the ORDER BY timestamp reads in get_recent_events and the export
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_events_timestamp
+                ON connectivity_events(timestamp)
+            ''')
+            
             # Create daily_summary table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS daily_summary (
@@ -84,13 +157,42 @@ class InternetLogbook:
                 )
             ''')
             
-            conn.commit()
-            conn.close()
+            self._conn.commit()
             self.logger.info(f"Database initialized: {self.db_file}")
             
         except Exception as e:
             self.logger.error(f"Error setting up database: {e}")
             
+    @contextmanager
+    def _transaction(self, mode: str = 'IMMEDIATE'):
+        """Run the enclosed statements in one transaction.
+        
+        Nested use joins the outer transaction, which commits once at the end.
+        """
+        if self._conn.in_transaction:
+            yield self._conn.cursor()
+            return
+            
+        self._conn.execute(f'BEGIN {mode}')
+        try:
+            yield self._conn.cursor()
+        except Exception:
+            self._conn.rollback()
+            raise
+        else:
+            self._conn.commit()
+            
+    def close(self):
+        """Flush buffered events and close the shared database connection."""
+        self._writer.shutdown(wait=True)
+        self.flush(force=True)
+        self._probe_pool.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+            
     def check_internet_connectivity(self) -> Tuple[bool, str, Optional[str]]:
         """Check internet connectivity and return status, error message, and network name."""
         test_urls = [
@@ -100,58 +202,70 @@ class InternetLogbook:
             'https://www.cloudflare.com', # Cloudflare
         ]
         
+        # Probe all hosts at once while the network name is looked up
+        futures = [self._probe_pool.submit(self._probe_url, url) for url in test_urls]
+        
         # Get current network name
         network_name = self.get_current_network()
         
-        for url in test_urls:
-            try:
-                response = requests.get(url, timeout=3)
-                if response.status_code == 200:
+        try:
+            for future in as_completed(futures):
+                if future.result():
                     return True, None, network_name
-            except requests.exceptions.RequestException as e:
-                continue
+        finally:
+            for future in futures:
+                future.cancel()
                 
         return False, "All connectivity tests failed", network_name
         
+    def _probe_url(self, url: str) -> bool:
+        """Return True if a HEAD request to url answers with 200."""
+        try:
+            response = self._session.head(url, timeout=3, allow_redirects=True)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+        
     def get_current_network(self) -> Optional[str]:
-        """Get the currently connected WiFi network name."""
+        """Get the currently connected WiFi network name (cached for network_cache_ttl seconds)."""
+        now = time.monotonic()
+        cached_at, cached_network = self._network_cache
+        if cached_at is not None and now - cached_at < self.network_cache_ttl:
+            return cached_network
+            
+        network_name = None
         try:
-            import subprocess
             result = subprocess.run(
                 ['netsh', 'wlan', 'show', 'interfaces'],
                 capture_output=True,
-                text=True,
-                check=True
+                check=True,
+                creationflags=CREATE_NO_WINDOW
             )
             
-            for line in result.stdout.split('\n'):
-                if 'Profile' in line and ':' in line:
-                    network = line.split(':')[1].strip()
-                    if network and network != 'Not configured':
-                        return network
+            for match in _PROFILE_RE.finditer(result.stdout):
+                network = match.group(1).decode(NETSH_ENCODING, errors='replace')
+                if network != 'Not configured':
+                    network_name = network
+                    break
                         
         except Exception:
             pass
             
-        return None
+        self._network_cache = (now, network_name)
+        return network_name
         
     def log_connectivity_event(self, status: str, duration: Optional[int] = None, 
-                              network_name: Optional[str] = None, error_message: Optional[str] = None):
-        """Log a connectivity event to the database and text file."""
+                              network_name: Optional[str] = None, error_message: Optional[str] = None,
+                              timestamp: Optional[str] = None):
+        """Log a connectivity event; the database and text file are written on flush().
+        
+        timestamp is an ISO 8601 string and defaults to now.
+        """
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            timestamp = datetime.now().isoformat()
+            if timestamp is None:
+                timestamp = datetime.now().isoformat()
             
-            cursor.execute('''
-                INSERT INTO connectivity_events 
-                (timestamp, status, duration_seconds, network_name, error_message)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (timestamp, status, duration, network_name, error_message))
-            
-            conn.commit()
-            conn.close()
+            self._pending_events.append((timestamp, status, duration, network_name, error_message))
             
             # Log to file as well
             if status == "DISCONNECTED":
@@ -169,108 +283,192 @@ class InternetLogbook:
             
     def save_to_text_file(self, status: str, timestamp: str, duration: Optional[int] = None,
                          network_name: Optional[str] = None, error_message: Optional[str] = None):
-        """Save connectivity event to a comprehensive text file."""
+        """Queue a connectivity event line for the comprehensive text file."""
         try:
-            text_file = "internet_connectivity_records.txt"
-            readable_time = datetime.fromisoformat(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-            
-            with open(text_file, 'a', encoding='utf-8') as f:
-                if status == "DISCONNECTED":
-                    f.write(f"[DISCONNECTED] {readable_time} | Network: {network_name} | Error: {error_message}\n")
-                elif status == "RECONNECTED":
-                    f.write(f"[RECONNECTED] {readable_time} | Network: {network_name} | Downtime: {duration} seconds\n")
-                elif status == "CONNECTED":
-                    f.write(f"[CONNECTED] {readable_time} | Network: {network_name}\n")
+            line_fmt = _LINE_FMT.get(status)
+            if line_fmt:
+                self._pending_text.append(line_fmt.format(
+                    t=_readable_time(timestamp), n=network_name, e=error_message, d=duration))
                     
         except Exception as e:
             self.logger.error(f"Error saving to text file: {e}")
             
-    def update_daily_summary(self, date: str, successful: bool):
-        """Update daily summary statistics."""
+    def flush(self, force: bool = False):
+        """Write buffered events to the database and text file.
+        
+        Buffered events are written once flush_batch_size have queued up or
+        flush_interval seconds have passed since the last flush, or always
+        when force is True.
+        """
+        if not self._pending_events and not self._pending_text:
+            return
+        if (not force and len(self._pending_events) < self.flush_batch_size
+                and time.time() - self._last_flush < self.flush_interval):
+            return
+            
+        events, self._pending_events = self._pending_events, []
+        lines, self._pending_text = self._pending_text, []
+        self._last_flush = time.time()
+        nested = self._conn.in_transaction
+        
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
+            if events:
+                with self._transaction() as cursor:
+                    cursor.executemany('''
+                        INSERT INTO connectivity_events 
+                        (timestamp, status, duration_seconds, network_name, error_message)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', events)
+        except Exception as e:
+            # Keep the batch, ahead of anything queued since, for the next flush;
+            # the text lines wait with it so the file never runs ahead of the database
+            self._pending_events[:0] = events
+            self._pending_text[:0] = lines
+            if nested:
+                # The caller's transaction must roll back rather than commit without the events
+                raise
+            self.logger.error(f"Error logging connectivity event: {e}")
+            return
             
-            # Get or create daily summary
-            cursor.execute('SELECT * FROM daily_summary WHERE date = ?', (date,))
-            row = cursor.fetchone()
+        if lines:
+            try:
+                self._writer.submit(self._append_records, ''.join(lines))
+            except RuntimeError:
+                # Writer already shut down (interpreter exit); write inline
+                self._append_records(''.join(lines))
+                
+    def _append_records(self, text: str):
+        """Append formatted lines to the comprehensive text file."""
+        try:
+            with open(self.records_file, 'a', encoding='utf-8') as f:
+                f.write(text)
+        except Exception as e:
+            self.logger.error(f"Error saving to text file: {e}")
             
-            if row:
-                # Update existing record
-                cursor.execute('''
-                    UPDATE daily_summary 
-                    SET total_checks = total_checks + 1,
-                        successful_checks = successful_checks + ?,
-                        failed_checks = failed_checks + ?
-                    WHERE date = ?
-                ''', (1 if successful else 0, 0 if successful else 1, date))
-            else:
-                # Create new record
+    def update_daily_summary(self, date: str, successful: bool):
+        """Update daily summary statistics."""
+        try:
+            # Insert today's row or bump its counters in a single statement
+            with self._transaction() as cursor:
                 cursor.execute('''
                     INSERT INTO daily_summary 
                     (date, total_checks, successful_checks, failed_checks)
                     VALUES (?, 1, ?, ?)
+                    ON CONFLICT(date) DO UPDATE
+                    SET total_checks = total_checks + 1,
+                        successful_checks = successful_checks + excluded.successful_checks,
+                        failed_checks = failed_checks + excluded.failed_checks
                 ''', (date, 1 if successful else 0, 0 if successful else 1))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             self.logger.error(f"Error updating daily summary: {e}")
             
     def monitor_once(self) -> bool:
         """Perform a single connectivity check and log the result."""
-        current_time = time.time()
         is_connected, error_message, network_name = self.check_internet_connectivity()
+        self.record(is_connected, network_name, error_message)
+        return is_connected
+        
+    def record(self, is_connected: bool, network_name: Optional[str] = None,
+               error_message: Optional[str] = None, ts: Optional[float] = None):
+        """Log the result of a connectivity check made elsewhere.
         
-        # Update daily summary
-        today = datetime.now().strftime('%Y-%m-%d')
-        self.update_daily_summary(today, is_connected)
-        
-        # Check for status changes
-        if self.last_status is not None and self.last_status != is_connected:
-            if is_connected:
-                # Just reconnected
-                if self.last_check_time:
-                    duration = int(current_time - self.last_check_time)
-                    self.log_connectivity_event("RECONNECTED", duration, network_name)
-            else:
-                # Just disconnected
-                self.log_connectivity_event("DISCONNECTED", None, network_name, error_message)
-        elif is_connected and self.last_status is None:
-            # First check and connected
-            self.log_connectivity_event("CONNECTED", None, network_name)
+        Lets a caller that already probed the connection skip a second probe.
+        ts is a Unix timestamp and defaults to now; the network name is only
+        looked up when a status change needs it.
+        """
+        # Read the clock once per tick and derive every timestamp from it
+        now = datetime.now() if ts is None else datetime.fromtimestamp(ts)
+        current_time = now.timestamp()
+        timestamp = now.isoformat()
+        
+        # Check for status changes; a network lookup may spawn netsh, so it
+        # happens before the write lock is taken
+        status_changed = self.last_status is not None and self.last_status != is_connected
+        first_connect = is_connected and self.last_status is None
+        if (status_changed or first_connect) and network_name is None:
+            network_name = self.get_current_network()
+            
+        # Summary update and any status-change event share one commit
+        try:
+            with self._transaction():
+                # Update daily summary
+                today = timestamp[:10]
+                self.update_daily_summary(today, is_connected)
+                
+                if status_changed:
+                    if is_connected:
+                        # Just reconnected
+                        if self.last_check_time:
+                            duration = int(current_time - self.last_check_time)
+                            self.log_connectivity_event("RECONNECTED", duration, network_name,
+                                                        timestamp=timestamp)
+                    else:
+                        # Just disconnected
+                        self.log_connectivity_event("DISCONNECTED", None, network_name,
+                                                    error_message or "All connectivity tests failed",
+                                                    timestamp=timestamp)
+                elif first_connect:
+                    # First check and connected
+                    self.log_connectivity_event("CONNECTED", None, network_name, timestamp=timestamp)
+                    
+                self.flush()
+        except Exception as e:
+            self.logger.error(f"Error recording connectivity check: {e}")
             
         self.last_status = is_connected
         self.last_check_time = current_time
         
-        return is_connected
+    def _query_recent_events(self, cursor, limit: int) -> List[Dict]:
+        """Fetch the most recent connectivity events with the given cursor."""
+        cursor.execute('''
+            SELECT timestamp, status, duration_seconds, network_name, error_message
+            FROM connectivity_events
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (limit,))
+        
+        events = []
+        for row in cursor.fetchall():
+            events.append({
+                'timestamp': row[0],
+                'status': row[1],
+                'duration_seconds': row[2],
+                'network_name': row[3],
+                'error_message': row[4]
+            })
+        
+        return events
+        
+    def _query_daily_summary(self, cursor, days: int) -> List[Dict]:
+        """Fetch the latest daily summary rows with the given cursor."""
+        cursor.execute('''
+            SELECT date, total_checks, successful_checks, failed_checks, 
+                   disconnect_count, total_disconnect_time, avg_recovery_time
+            FROM daily_summary
+            ORDER BY date DESC
+            LIMIT ?
+        ''', (days,))
+        
+        summaries = []
+        for row in cursor.fetchall():
+            summaries.append({
+                'date': row[0],
+                'total_checks': row[1],
+                'successful_checks': row[2],
+                'failed_checks': row[3],
+                'disconnect_count': row[4],
+                'total_disconnect_time': row[5],
+                'avg_recovery_time': row[6]
+            })
+        
+        return summaries
         
     def get_recent_events(self, limit: int = 50) -> List[Dict]:
         """Get recent connectivity events."""
+        self.flush(force=True)
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT timestamp, status, duration_seconds, network_name, error_message
-                FROM connectivity_events
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (limit,))
-            
-            events = []
-            for row in cursor.fetchall():
-                events.append({
-                    'timestamp': row[0],
-                    'status': row[1],
-                    'duration_seconds': row[2],
-                    'network_name': row[3],
-                    'error_message': row[4]
-                })
-            
-            conn.close()
-            return events
+            return self._query_recent_events(self._conn.cursor(), limit)
             
         except Exception as e:
             self.logger.error(f"Error getting recent events: {e}")
@@ -279,41 +477,62 @@ class InternetLogbook:
     def get_daily_summary(self, days: int = 7) -> List[Dict]:
         """Get daily summary for the last N days."""
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
+            return self._query_daily_summary(self._conn.cursor(), days)
+            
+        except Exception as e:
+            self.logger.error(f"Error getting daily summary: {e}")
+            return []
+            
+    def get_weekly_summary(self, weeks: int = 4) -> List[Dict]:
+        """Get disconnect counts and downtime per week for the last N weeks.
+        
+        The rollup is done by SQLite in a single grouped scan rather than by
+        looping over event rows in Python.
+        """
+        self.flush(force=True)
+        try:
+            cursor = self._conn.cursor()
             
             cursor.execute('''
-                SELECT date, total_checks, successful_checks, failed_checks, 
-                       disconnect_count, total_disconnect_time, avg_recovery_time
-                FROM daily_summary
-                ORDER BY date DESC
+                SELECT strftime('%Y-W%W', timestamp) AS week,
+                       COUNT(*),
+                       SUM(status = 'DISCONNECTED'),
+                       SUM(CASE WHEN status = 'RECONNECTED' THEN duration_seconds ELSE 0 END),
+                       AVG(CASE WHEN status = 'RECONNECTED' THEN duration_seconds END)
+                FROM connectivity_events
+                GROUP BY week
+                ORDER BY week DESC
                 LIMIT ?
-            ''', (days,))
+            ''', (weeks,))
             
             summaries = []
             for row in cursor.fetchall():
                 summaries.append({
-                    'date': row[0],
-                    'total_checks': row[1],
-                    'successful_checks': row[2],
-                    'failed_checks': row[3],
-                    'disconnect_count': row[4],
-                    'total_disconnect_time': row[5],
-                    'avg_recovery_time': row[6]
+                    'week': row[0],
+                    'event_count': row[1],
+                    'disconnect_count': row[2],
+                    'total_disconnect_time': row[3],
+                    'avg_recovery_time': row[4] or 0
                 })
             
-            conn.close()
             return summaries
             
         except Exception as e:
-            self.logger.error(f"Error getting daily summary: {e}")
+            self.logger.error(f"Error getting weekly summary: {e}")
             return []
             
+    def _fetch_report_data(self, limit: int, days: int) -> Tuple[List[Dict], List[Dict]]:
+        """Fetch recent events and daily summaries from one read snapshot."""
+        self.flush(force=True)
+        with self._transaction('DEFERRED') as cursor:
+            events = self._query_recent_events(cursor, limit)
+            summaries = self._query_daily_summary(cursor, days)
+        return events, summaries
+        
     def generate_report(self, days: int = 7) -> str:
         """Generate a comprehensive connectivity report."""
         try:
-            events = self.get_recent_events(100)
-            summaries = self.get_daily_summary(days)
+            events, summaries = self._fetch_report_data(100, days)
             
             report = []
             report.append("=" * 60)
@@ -354,65 +573,45 @@ class InternetLogbook:
             
     def export_all_records_to_text(self, filename: str = "internet_connectivity_full_export.txt"):
         """Export all records to a comprehensive text file."""
+        self.flush(force=True)
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            # Get all events
-            cursor.execute('''
-                SELECT timestamp, status, duration_seconds, network_name, error_message
-                FROM connectivity_events
-                ORDER BY timestamp ASC
-            ''')
-            
-            events = cursor.fetchall()
-            
-            # Get daily summaries
-            cursor.execute('''
-                SELECT date, total_checks, successful_checks, failed_checks, 
-                       disconnect_count, total_disconnect_time, avg_recovery_time
-                FROM daily_summary
-                ORDER BY date ASC
-            ''')
-            
-            summaries = cursor.fetchall()
-            
-            conn.close()
-            
-            # Write to text file
-            with open(filename, 'w', encoding='utf-8') as f:
+            # Rows are streamed from the cursor straight into a large write buffer
+            # instead of being materialised with fetchall()
+            with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f, \
+                    self._transaction('DEFERRED') as cursor:
+                # One read transaction so every query sees the same snapshot
+                cursor.execute('SELECT COUNT(*) FROM connectivity_events')
+                event_count = cursor.fetchone()[0]
+                
                 f.write("=" * 80 + "\n")
                 f.write("INTERNET CONNECTIVITY FULL RECORDS EXPORT\n")
                 f.write("=" * 80 + "\n")
                 f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Total Events: {len(events)}\n")
+                f.write(f"Total Events: {event_count}\n")
                 f.write(f"Database: {self.db_file}\n")
                 f.write("=" * 80 + "\n\n")
                 
                 # Daily Summary Section
+                cursor.execute('''
+                    SELECT date, total_checks, successful_checks, failed_checks, 
+                           disconnect_count, total_disconnect_time, avg_recovery_time
+                    FROM daily_summary
+                    ORDER BY date ASC
+                ''')
                 f.write("DAILY SUMMARY\n")
                 f.write("-" * 40 + "\n")
-                for summary in summaries:
-                    date, total, successful, failed, disconnects, downtime, avg_recovery = summary
-                    success_rate = (successful / total * 100) if total > 0 else 0
-                    f.write(f"{date}: {successful}/{total} checks ({success_rate:.1f}% success)\n")
-                    if disconnects > 0:
-                        f.write(f"  - Disconnects: {disconnects}, Total downtime: {downtime}s, Avg recovery: {avg_recovery:.1f}s\n")
+                f.writelines(_format_summary_lines(cursor))
                 f.write("\n")
                 
                 # All Events Section
+                cursor.execute('''
+                    SELECT timestamp, status, duration_seconds, network_name, error_message
+                    FROM connectivity_events
+                    ORDER BY timestamp ASC
+                ''')
                 f.write("ALL CONNECTIVITY EVENTS\n")
                 f.write("-" * 40 + "\n")
-                for event in events:
-                    timestamp, status, duration, network_name, error_message = event
-                    readable_time = datetime.fromisoformat(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    if status == "DISCONNECTED":
-                        f.write(f"[DISCONNECTED] {readable_time} | Network: {network_name} | Error: {error_message}\n")
-                    elif status == "RECONNECTED":
-                        f.write(f"[RECONNECTED] {readable_time} | Network: {network_name} | Downtime: {duration} seconds\n")
-                    elif status == "CONNECTED":
-                        f.write(f"[CONNECTED] {readable_time} | Network: {network_name}\n")
+                f.writelines(_format_event_lines(cursor))
                 
                 f.write("\n" + "=" * 80 + "\n")
                 f.write("END OF EXPORT\n")
@@ -426,15 +625,40 @@ class InternetLogbook:
             return None
 
 
+def _format_summary_lines(rows):
+    """Yield export lines for daily_summary rows."""
+    for date, total, successful, failed, disconnects, downtime, avg_recovery in rows:
+        success_rate = (successful / total * 100) if total > 0 else 0
+        yield f"{date}: {successful}/{total} checks ({success_rate:.1f}% success)\n"
+        if disconnects > 0:
+            yield f"  - Disconnects: {disconnects}, Total downtime: {downtime}s, Avg recovery: {avg_recovery:.1f}s\n"
+
+
+def _format_event_lines(rows):
+    """Yield export lines for connectivity_events rows."""
+    for timestamp, status, duration, network_name, error_message in rows:
+        line_fmt = _LINE_FMT.get(status)
+        if line_fmt:
+            yield line_fmt.format(t=_readable_time(timestamp), n=network_name, e=error_message, d=duration)
+
+
 def main():
     """Main entry point for testing the logbook."""
     import argparse
     
+    def positive_int(value):
+        """argparse type for counts that must be at least 1."""
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+        return number
+        
     parser = argparse.ArgumentParser(description='Internet Connectivity Logbook')
     parser.add_argument('--check', action='store_true', help='Perform a single connectivity check')
     parser.add_argument('--report', action='store_true', help='Generate and display report')
     parser.add_argument('--events', type=int, default=20, help='Number of recent events to show')
     parser.add_argument('--days', type=int, default=7, help='Number of days for summary')
+    parser.add_argument('--weekly', type=positive_int, metavar='WEEKS', help='Show disconnects and downtime for the last WEEKS weeks')
     parser.add_argument('--export', action='store_true', help='Export all records to text file')
     parser.add_argument('--export-file', default='internet_connectivity_full_export.txt', help='Export filename')
     
@@ -451,6 +675,15 @@ def main():
         report = logbook.generate_report(args.days)
         print(report)
         
+    elif args.weekly is not None:
+        summaries = logbook.get_weekly_summary(args.weekly)
+        print(f"\nWeekly Summary (Last {len(summaries)} Weeks):")
+        print("-" * 50)
+        for summary in summaries:
+            print(f"{summary['week']}: {summary['disconnect_count']} disconnects | "
+                  f"{summary['total_disconnect_time']}s downtime | "
+                  f"avg recovery {summary['avg_recovery_time']:.1f}s")
+        
     elif args.export:
         print("Exporting all records to text file...")
         filename = logbook.export_all_records_to_text(args.export_file)
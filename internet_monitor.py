@@ -7,13 +7,21 @@ Continuously monitors internet connectivity and automatically runs WiFi agent wh
 import argparse
 import json
 import logging
+import logging.handlers
 import os
+import re
+import socket
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Import the logbook
 try:
@@ -22,6 +30,89 @@ try:
 except ImportError:
     LOGBOOK_AVAILABLE = False
 
+# psutil (optional) reads adapter state in-process instead of spawning netsh
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Import the WiFi agent up front so the first failure doesn't pay for loading Selenium
+try:
+    from wifi_hotspot_agent import WiFiHotspotAgent
+    WIFI_AGENT_AVAILABLE = True
+except ImportError:
+    WIFI_AGENT_AVAILABLE = False
+
+# Hosts probed to decide whether the internet is reachable
+PROBE_URLS = [
+    'https://8.8.8.8',           # Google DNS
+    'https://1.1.1.1',           # Cloudflare DNS
+    'https://www.google.com',     # Google
+    'https://www.cloudflare.com', # Cloudflare
+    'https://httpbin.org/get'     # HTTPBin
+]
+
+# (connect, read) timeouts for each probe: a stalled handshake is abandoned
+# after 2s instead of consuming the whole budget
+PROBE_TIMEOUT = (2, 3)
+
+# Connect timeout of the TCP pre-check that spots a dead link before any HTTPS
+TCP_PROBE_TIMEOUT = 1
+
+# Interface name of each "Connected" row of `netsh interface show interface`
+_CONNECTED_INTERFACE_RE = re.compile(rb'^\s*\S+\s+Connected\s+\S+\s+(.+?)\s*$', re.MULTILINE)
+
+# Python does not cache DNS, so resolutions of the probe hostnames are kept
+# for DNS_CACHE_TTL seconds and dropped whenever a check fails, since a captive
+# portal may have answered them; every other lookup goes straight to the
+# resolver. Set "dns_cache": false in the config to turn this off.
+DNS_CACHE_TTL = 300
+_PROBE_HOSTS = frozenset(urlsplit(url).hostname for url in PROBE_URLS)
+_dns_cache: Dict[tuple, tuple] = {}
+_next_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    """socket.getaddrinfo that caches successful lookups of the probe hosts."""
+    if host not in _PROBE_HOSTS:
+        return _next_getaddrinfo(host, port, *args, **kwargs)
+        
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    cached = _dns_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+        
+    result = _next_getaddrinfo(host, port, *args, **kwargs)
+    _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def _install_dns_cache():
+    """Route socket.getaddrinfo through the cache, chaining to any wrapper already installed."""
+    global _next_getaddrinfo
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        _next_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+class IntervalMemoryHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes once its oldest buffered record is flush_interval seconds old.
+    
+    check_monitor_status.py judges liveness from the last line of the log, so
+    buffered records must not sit in memory for long.
+    """
+    
+    def __init__(self, capacity: int, flush_interval: float, **kwargs):
+        super().__init__(capacity, **kwargs)
+        self.flush_interval = flush_interval
+        
+    def shouldFlush(self, record: logging.LogRecord) -> bool:
+        if super().shouldFlush(record):
+            return True
+        return record.created - self.buffer[0].created >= self.flush_interval
+
 
 class InternetMonitor:
     """Monitors internet connectivity and triggers WiFi agent when needed."""
@@ -39,9 +130,33 @@ class InternetMonitor:
         self.debug = debug
         self.failure_count = 0
         self.max_failures = 3
+        self._stop = threading.Event()
+        
+        # The WiFi agent is kept between failures and rebuilt once it has been
+        # idle for agent_keepalive seconds or the config file has changed
+        self.agent_keepalive = 300
+        self._agent = None
+        self._agent_last_used = 0.0
+        
+        # The active adapter rarely changes, so netsh is only re-run after this TTL
+        self.connection_type_ttl = 60
+        self._connection_type_cache = (None, None)
         self.setup_logging()
         self.config = self._load_config()
         
+        if (self.config or {}).get('dns_cache', True):
+            _install_dns_cache()
+        
+        # Keep-alive session so repeat probes reuse pooled connections
+        self._session = requests.Session()
+        # Probes run in parallel against several hosts, so retrying one is never worth the wait
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8,
+                              max_retries=Retry(total=0, connect=0, read=0, backoff_factor=0))
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        # One worker per probe host
+        self._probe_pool = ThreadPoolExecutor(max_workers=len(PROBE_URLS))
+        
         # Initialize logbook if available
         if LOGBOOK_AVAILABLE:
             self.logbook = InternetLogbook()
@@ -52,22 +167,48 @@ class InternetMonitor:
         
     def setup_logging(self):
         """Setup logging configuration."""
+        log_format = '%(asctime)s - %(levelname)s - %(message)s'
+        
+        # Size-capped log, written in batches; warnings flush immediately
+        file_handler = logging.handlers.RotatingFileHandler(
+            'internet_monitor.log', maxBytes=1_048_576, backupCount=5, encoding='utf-8'
+        )
+        file_handler.setFormatter(logging.Formatter(log_format))
+        buffered_file_handler = IntervalMemoryHandler(
+            capacity=64,
+            flush_interval=30,
+            flushLevel=logging.WARNING,
+            target=file_handler
+        )
+        
+        # Routine INFO lines only go to the console in debug mode
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if not self.debug:
+            stream_handler.setLevel(logging.WARNING)
+        
         logging.basicConfig(
             level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
+            format=log_format,
             handlers=[
-                logging.FileHandler('internet_monitor.log'),
-                logging.StreamHandler(sys.stdout)
+                buffered_file_handler,
+                stream_handler
             ]
         )
         self.logger = logging.getLogger(__name__)
         
     def _load_config(self) -> Optional[Dict]:
         """Load configuration from JSON file."""
+        self._configured_ssids = frozenset()
+        self._config_mtime = self._get_config_mtime()
         try:
             with open(self.config_file, 'r') as f:
                 config = json.load(f)
             self.logger.info(f"Configuration loaded from {self.config_file}")
+            
+            # Built once here so is_configured_hotspot is a set lookup
+            self._configured_ssids = frozenset(
+                hotspot['ssid'] for hotspot in config.get('hotspots', []) if 'ssid' in hotspot
+            )
             return config
         except FileNotFoundError:
             self.logger.warning(f"Configuration file {self.config_file} not found. Using defaults.")
@@ -76,51 +217,113 @@ class InternetMonitor:
             self.logger.error(f"Invalid JSON in configuration file: {e}")
             return None
             
+    def _get_config_mtime(self) -> Optional[int]:
+        """Return the config file's modification time, or None if it is missing."""
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+            
+    def reload_config_if_changed(self) -> bool:
+        """Reload the configuration only if the file changed since it was last read."""
+        if self._get_config_mtime() == self._config_mtime:
+            return False
+            
+        self.config = self._load_config()
+        return True
+        
     def check_internet_connectivity(self) -> bool:
         """Check if internet is accessible using multiple reliable hosts."""
-        test_urls = [
-            'https://8.8.8.8',           # Google DNS
-            'https://1.1.1.1',           # Cloudflare DNS
-            'https://www.google.com',     # Google
-            'https://www.cloudflare.com', # Cloudflare
-            'https://httpbin.org/get'     # HTTPBin
-        ]
-        
-        successful_connections = 0
+        test_urls = PROBE_URLS
         
-        for url in test_urls:
+        # Every HTTPS probe needs a TCP connection to its host's port 443; when
+        # none can be opened the link is down and the HTTPS round is skipped.
+        # An open port proves nothing (portals accept them), so HTTPS still decides
+        if self._any_tcp_reachable(_PROBE_HOSTS, 443):
+            # A single 200 already proves the internet is up, so take the first
+            # success; only report offline once every probe host has failed
+            futures = [self._probe_pool.submit(self._probe_url, url) for url in test_urls]
             try:
-                response = requests.get(url, timeout=5)
-                if response.status_code == 200:
-                    successful_connections += 1
-                    if successful_connections >= 2:  # Need at least 2 successful connections
+                for future in as_completed(futures):
+                    if future.result():
                         return True
-            except requests.exceptions.RequestException:
-                continue
-                
+            finally:
+                for future in futures:
+                    future.cancel()
+                    
+        # A portal may have answered the probe hosts' lookups; resolve afresh next time
+        _dns_cache.clear()
         return False
         
+    def _any_tcp_reachable(self, hosts, port: int) -> bool:
+        """Return True as soon as a TCP connection to any host on port succeeds."""
+        futures = [self._probe_pool.submit(self._tcp_probe, host, port) for host in hosts]
+        try:
+            return any(future.result() for future in as_completed(futures))
+        finally:
+            for future in futures:
+                future.cancel()
+                
+    @staticmethod
+    def _tcp_probe(host: str, port: int) -> bool:
+        """Return True if a TCP connection to host:port can be opened."""
+        try:
+            with socket.create_connection((host, port), timeout=TCP_PROBE_TIMEOUT):
+                return True
+        except OSError:
+            return False
+            
+    def _probe_url(self, url: str) -> bool:
+        """Return True if url answers with 200."""
+        try:
+            # HEAD skips the response body; redirects are still followed as GET did
+            response = self._session.head(url, timeout=PROBE_TIMEOUT, allow_redirects=True)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+        
     def get_current_connection_type(self) -> str:
-        """Get the current connection type (Ethernet or WiFi)."""
+        """Get the current connection type (Ethernet or WiFi), cached for connection_type_ttl seconds."""
+        now = time.monotonic()
+        cached_at, cached_type = self._connection_type_cache
+        if cached_at is not None and now - cached_at < self.connection_type_ttl:
+            return cached_type
+            
+        connection_type = self._query_connection_type()
+        self._connection_type_cache = (now, connection_type)
+        return connection_type
+        
+    def _query_connection_type(self) -> str:
+        """Work out which adapter is connected."""
+        for name in self._connected_interfaces():
+            if 'Ethernet' in name:
+                return "Ethernet"
+            elif 'Wi-Fi' in name:
+                return "WiFi"
+                
+        return "Unknown"
+        
+    def _connected_interfaces(self) -> List[str]:
+        """List the names of connected network interfaces."""
+        if PSUTIL_AVAILABLE:
+            return [name for name, stats in psutil.net_if_stats().items() if stats.isup]
+            
         try:
             # Check Ethernet connection status
             result = subprocess.run(
                 ['netsh', 'interface', 'show', 'interface'],
                 capture_output=True,
-                text=True,
                 check=True
             )
             
-            for line in result.stdout.split('\n'):
-                if 'Ethernet' in line and 'Connected' in line:
-                    return "Ethernet"
-                elif 'Wi-Fi' in line and 'Connected' in line:
-                    return "WiFi"
+            # Only the matched interface names are decoded
+            return [match.group(1).decode(errors='replace')
+                    for match in _CONNECTED_INTERFACE_RE.finditer(result.stdout)]
                     
         except subprocess.CalledProcessError as e:
             self.logger.error(f"Failed to get connection type: {e}")
             
-        return "Unknown"
+        return []
         
     def get_current_wifi_network(self) -> Optional[str]:
         """Get the currently connected WiFi network name (disabled for Ethernet mode)."""
@@ -129,22 +332,18 @@ class InternetMonitor:
         
     def is_configured_hotspot(self, network_name: str) -> bool:
         """Check if the current network is a configured hotspot."""
-        if not self.config or 'hotspots' not in self.config:
-            return False
-            
-        configured_ssids = [hotspot['ssid'] for hotspot in self.config['hotspots']]
-        return network_name in configured_ssids
+        return network_name in self._configured_ssids
         
     def run_wifi_agent(self) -> bool:
         """Run the WiFi hotspot agent."""
+        if not WIFI_AGENT_AVAILABLE:
+            self.logger.error("WiFi hotspot agent not found. Make sure wifi_hotspot_agent.py is in the same directory.")
+            return False
+            
         try:
             self.logger.info("Running WiFi hotspot agent...")
             
-            # Import and run the WiFi agent
-            from wifi_hotspot_agent import WiFiHotspotAgent
-            
-            # Let the agent read debug settings from config file
-            agent = WiFiHotspotAgent(self.config_file)
+            agent = self._get_agent()
             success = agent.run()
             
             if success:
@@ -155,32 +354,58 @@ class InternetMonitor:
                 
             return success
             
-        except ImportError:
-            self.logger.error("WiFi hotspot agent not found. Make sure wifi_hotspot_agent.py is in the same directory.")
-            return False
         except Exception as e:
             self.logger.error(f"Error running WiFi agent: {e}")
             return False
             
+    def _get_agent(self):
+        """Return the cached WiFi agent, creating a fresh one when none is live."""
+        config_changed = self.reload_config_if_changed()
+        now = time.monotonic()
+        if (self._agent is None or config_changed
+                or now - self._agent_last_used > self.agent_keepalive):
+            if self._agent is not None:
+                # Release the old agent's browser before replacing it
+                self._agent.close()
+            # Let the agent read debug settings from config file; it shares our
+            # session so its HTTP portal login reuses the pooled connections
+            self._agent = WiFiHotspotAgent(self.config_file, session=self._session)
+        self._agent_last_used = now
+        return self._agent
+        
+    def _release_idle_agent(self, force: bool = False):
+        """Close the cached WiFi agent (and its browser) once it has sat idle past the keepalive."""
+        if self._agent is None:
+            return
+        if force or time.monotonic() - self._agent_last_used > self.agent_keepalive:
+            try:
+                self._agent.close()
+            except Exception as e:
+                self.logger.debug("Error closing WiFi agent: %s", e)
+            self._agent = None
+            
     def monitor_once(self) -> bool:
         """Perform a single connectivity check."""
         self.logger.info("Checking internet connectivity...")
         
         is_connected = self.check_internet_connectivity()
-        connection_type = self.get_current_connection_type()
         
-        # Log to logbook if available
+        # Hand the result to the logbook rather than letting it probe again
         if self.logbook:
-            self.logbook.monitor_once()
+            self.logbook.record(is_connected, ts=time.time())
         
         if is_connected:
             self.logger.info("Internet is available")
             self.failure_count = 0
+            self._release_idle_agent()
             return True
         else:
             self.failure_count += 1
             self.logger.warning(f"Internet not available (failure #{self.failure_count})")
             
+            # Only the failure path needs to know which adapter is in use
+            connection_type = self.get_current_connection_type()
+            
             # For Ethernet mode, always run the agent when internet fails
             # This handles AP router logouts from EE WiFi network
             if connection_type == "Ethernet":
@@ -196,15 +421,24 @@ class InternetMonitor:
         """Continuously monitor internet connectivity."""
         self.logger.info(f"Starting continuous internet monitoring (interval: {self.check_interval}s)")
         
+        # Event.wait() on the main thread is not interrupted by Ctrl+C on Windows,
+        # so the foreground loop sleeps instead; the background worker can still
+        # wake early when run() sets the stop event
+        in_foreground = threading.current_thread() is threading.main_thread()
         try:
-            while True:
+            while not self._stop.is_set():
                 self.monitor_once()
-                time.sleep(self.check_interval)
-                
+                if in_foreground:
+                    time.sleep(self.check_interval)
+                else:
+                    self._stop.wait(self.check_interval)
+
         except KeyboardInterrupt:
             self.logger.info("Monitoring stopped by user")
         except Exception as e:
             self.logger.error(f"Unexpected error in monitoring loop: {e}")
+        finally:
+            self._release_idle_agent(force=True)
             
     def run(self, once: bool = False, background: bool = False):
         """Main execution method."""
@@ -217,15 +451,19 @@ class InternetMonitor:
                 self.logger.info("Starting background monitoring")
                 # In a real implementation, you might want to daemonize the process
                 # For now, we'll just run in the background
-                import threading
                 monitor_thread = threading.Thread(target=self.monitor_continuous)
                 monitor_thread.daemon = True
                 monitor_thread.start()
                 
                 try:
-                    while True:
-                        time.sleep(1)
+                    # Wake once per check interval rather than every second; time.sleep
+                    # is used because, unlike Event.wait(), Ctrl+C interrupts it on Windows
+                    while monitor_thread.is_alive():
+                        time.sleep(self.check_interval)
                 except KeyboardInterrupt:
+                    self._stop.set()
+                    # Let the worker leave its loop so it closes the agent's browser
+                    monitor_thread.join(timeout=self.check_interval)
                     self.logger.info("Background monitoring stopped")
             else:
                 self.monitor_continuous()
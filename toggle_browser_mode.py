@@ -6,20 +6,41 @@ Switch between visible (debug) and invisible (production) browser modes
 
 import json
 import os
+import tempfile
 
-def toggle_browser_mode():
-    """Toggle between debug and production browser modes."""
-    config_file = "wifi_config.json"
-    
+CONFIG_FILE = "wifi_config.json"
+
+def load_config(config_file=CONFIG_FILE):
+    """Load the configuration once so every helper can share it."""
     if not os.path.exists(config_file):
         print("❌ Configuration file not found")
-        return
+        return None
     
     try:
-        # Load current configuration
         with open(config_file, 'r') as f:
-            config = json.load(f)
-        
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ Error reading configuration: {e}")
+        return None
+
+def save_config(config, config_file=CONFIG_FILE):
+    """Write the configuration atomically so the monitor never sees a partial file."""
+    config_dir = os.path.dirname(config_file) or '.'
+    with tempfile.NamedTemporaryFile('w', dir=config_dir, suffix='.tmp', delete=False) as tmp:
+        try:
+            json.dump(config, tmp, indent=4)
+        except Exception:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    os.replace(tmp.name, config_file)
+
+def toggle_browser_mode(config, config_file=CONFIG_FILE):
+    """Toggle between debug and production browser modes.
+    
+    The caller's config is only updated once the new settings are saved.
+    """
+    try:
         # Get current settings
         current_debug = config.get('debug_mode', False)
         current_headless = config.get('headless_browser', True)
@@ -28,13 +49,14 @@ def toggle_browser_mode():
         new_debug = not current_debug
         new_headless = not current_headless
         
-        # Update configuration
-        config['debug_mode'] = new_debug
-        config['headless_browser'] = new_headless
+        # Update a copy of the configuration
+        new_config = dict(config)
+        new_config['debug_mode'] = new_debug
+        new_config['headless_browser'] = new_headless
         
         # Save configuration
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=4)
+        save_config(new_config, config_file)
+        config.update(new_config)
         
         # Display results
         if new_debug:
@@ -53,49 +75,41 @@ def toggle_browser_mode():
     except Exception as e:
         print(f"❌ Error updating configuration: {e}")
 
-def show_current_mode():
+def show_current_mode(config):
     """Show current browser mode."""
-    config_file = "wifi_config.json"
+    debug_mode = config.get('debug_mode', False)
+    headless_mode = config.get('headless_browser', True)
     
-    if not os.path.exists(config_file):
-        print("❌ Configuration file not found")
-        return
+    print("📊 Current Browser Mode:")
+    print(f"• Debug Mode: {'ON' if debug_mode else 'OFF'}")
+    print(f"• Headless Browser: {'ON' if headless_mode else 'OFF'}")
     
-    try:
-        with open(config_file, 'r') as f:
-            config = json.load(f)
-        
-        debug_mode = config.get('debug_mode', False)
-        headless_mode = config.get('headless_browser', True)
-        
-        print("📊 Current Browser Mode:")
-        print(f"• Debug Mode: {'ON' if debug_mode else 'OFF'}")
-        print(f"• Headless Browser: {'ON' if headless_mode else 'OFF'}")
-        
-        if debug_mode and not headless_mode:
-            print("• Status: 🔍 DEBUG MODE (Visible Browser)")
-        elif not debug_mode and headless_mode:
-            print("• Status: 🚀 PRODUCTION MODE (Invisible Browser)")
-        else:
-            print("• Status: ⚠️  MIXED MODE (Check configuration)")
-            
-    except Exception as e:
-        print(f"❌ Error reading configuration: {e}")
+    if debug_mode and not headless_mode:
+        print("• Status: 🔍 DEBUG MODE (Visible Browser)")
+    elif not debug_mode and headless_mode:
+        print("• Status: 🚀 PRODUCTION MODE (Invisible Browser)")
+    else:
+        print("• Status: ⚠️  MIXED MODE (Check configuration)")
 
 def main():
     """Main function."""
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == "show":
-        show_current_mode()
+        config = load_config()
+        if config is not None:
+            show_current_mode(config)
     else:
         print("🔄 Toggling Browser Mode...")
         print("=" * 40)
-        show_current_mode()
+        config = load_config()
+        if config is None:
+            return
+        show_current_mode(config)
         print("\n" + "=" * 40)
-        toggle_browser_mode()
+        toggle_browser_mode(config)
         print("=" * 40)
-        show_current_mode()
+        show_current_mode(config)
 
 if __name__ == "__main__":
     main()
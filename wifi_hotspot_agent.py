@@ -2,39 +2,688 @@
 """
 WiFi Hotspot Auto-Connect Agent
 Automatically connects to WiFi hotspots and handles captive portal authentication.
+
+Exit codes (see RunResult): 0 online, 1 error, 2 no hotspot configured to
+log in to, 3 every captive portal login failed. A scheduler can stop
+retrying on 2, since nothing changes until the configuration does.
 """
 
+import atexit
 import json
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import socket
 import subprocess
 import sys
+import tempfile
 import time
-from typing import Dict, List, Optional
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property, lru_cache
+from html.parser import HTMLParser
+from types import MappingProxyType
+from enum import IntEnum
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
 
+import _wlan
+import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+# orjson (optional) parses the configuration faster than the stdlib json module
+try:
+    import orjson
+    _json_loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _json_loads = json.loads
+    ORJSON_AVAILABLE = False
+
+# Purpose-built connectivity check endpoints, probed to decide whether the
+# internet is reachable, with the status and body each returns when it is.
+# All plain HTTP: a captive portal can only intercept (and so reveal itself
+# on) unencrypted requests, and a 200 from the portal's own page is told
+# apart by the body
+TEST_URLS = [
+    ('http://connectivitycheck.gstatic.com/generate_204', 204, b''),
+    ('http://www.msftconnecttest.com/connecttest.txt', 200, b'Microsoft Connect Test'),
+    ('http://detectportal.firefox.com/success.txt', 200, b'success'),
+]
+
+# (connect, read) timeouts for each probe: a stalled handshake is abandoned
+# after 2s instead of holding up the concurrent check for the full 3s
+PROBE_TIMEOUT = (2, 3)
+
+# Seconds a listing of the saved WiFi networks is reused
+NETWORKS_CACHE_TTL = 30
+
+# Longest a navigation may block; a portal still loading after this is
+# stopped and used as far as it got, so a hung page can't stall the agent
+PAGE_LOAD_TIMEOUT = 20
+
+# Answers 204 with an empty body on an open network; a captive portal
+# intercepts it with a redirect or its own page
+PORTAL_PROBE_URL = 'http://connectivitycheck.gstatic.com/generate_204'
+# Sent with connectivity probes so a transparent proxy can't answer from its cache
+NO_CACHE_HEADERS = {'Cache-Control': 'no-cache, no-store', 'Pragma': 'no-cache'}
+DEFAULT_PORTAL_URL = 'http://www.google.com'
+
+# Resolutions of the test hostnames are kept for DNS_CACHE_TTL seconds and
+# dropped whenever a connectivity check fails, since a captive portal may have
+# answered them. Set "dns_cache": false in the config to turn this off.
+DNS_CACHE_TTL = 900
+_TEST_HOSTS = frozenset(urlsplit(url).hostname for url, _, _ in TEST_URLS)
+_dns_cache: Dict[tuple, tuple] = {}
+_next_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    """socket.getaddrinfo that caches successful lookups of the test hosts."""
+    if host not in _TEST_HOSTS:
+        return _next_getaddrinfo(host, port, *args, **kwargs)
+        
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    cached = _dns_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+        
+    result = _next_getaddrinfo(host, port, *args, **kwargs)
+    _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def _install_dns_cache():
+    """Route socket.getaddrinfo through the cache, chaining to any wrapper already installed."""
+    global _next_getaddrinfo
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        _next_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+# (absolute path, mtime_ns) -> parsed configuration, so agents created again
+# in the same process skip re-reading an unchanged file
+_config_cache: Dict[tuple, Mapping] = {}
+
+# Where the last working ChromeDriver path is remembered between runs
+DRIVER_PATH_FILE = os.path.join(os.path.expanduser("~"), ".wifi_agent", "chromedriver_path.txt")
+
+def _find_newest(root: str, name: str) -> Optional[str]:
+    """Return the most recently modified file called name anywhere under root.
+    
+    One scandir pass over the tree; a version directory that lacks the file
+    no longer hides older ones that have it.
+    """
+    best_mtime, best_path = -1.0, None
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name == name and entry.is_file():
+                        mtime = entry.stat().st_mtime
+                        if mtime > best_mtime:
+                            best_mtime, best_path = mtime, entry.path
+        except OSError:
+            continue
+    return best_path
+
+
+# Background writer of the agent's log, when the agent set up logging itself
+_log_listener = None
+
+# Match counts of the login selectors, used to try the usual winners first
+SELECTOR_STATS_FILE = os.path.join(os.path.expanduser("~"), ".wifi_agent", "selector_stats.json")
+
+# Login successes and failures per hotspot SSID, used to try the likeliest first
+HOTSPOT_STATS_FILE = os.path.join(os.path.expanduser("~"), ".wifi_agent", "hotspot_stats.json")
+
+
+@lru_cache(maxsize=None)
+def _selector_list_key(selectors: Tuple[str, ...]) -> str:
+    """Stable short id for a selector list, so its stats survive between runs.
+    
+    The lists are class-level tuples, so each key is computed once per process.
+    """
+    return format(zlib.crc32('\n'.join(selectors).encode('utf-8')), '08x')
+
+
+# Requests the browser never needs for a portal login: web fonts, media and
+# analytics / ad scripts, which captive portals often carry plenty of
+BLOCKED_URL_PATTERNS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.mp3',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*',
+]
+
+# Chrome profile kept between runs so cookies, HTTP cache and TLS sessions stay
+# warm; set "chrome_profile_dir" in the config to move it, or to "" to disable.
+# It lives beside the agent's other state rather than in the temp directory,
+# which disk cleanup tools empty
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".wifi_agent", "chrome")
+
+# SSID line of `netsh wlan show interfaces` (BSSID lines don't match)
+_SSID_RE = re.compile(rb'^\s*SSID\s*:\s*(.+?)\s*$', re.MULTILINE)
+
+# Interface GUID of `netsh wlan show interfaces`; the labels around it are localised
+_INTERFACE_GUID_RE = re.compile(rb'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+# Profile lines of `netsh wlan show profiles`; names may themselves contain ':'
+_PROFILE_RE = re.compile(rb'^\s*All User Profile\s*:\s*(.+?)\s*$', re.MULTILINE)
+
+# netsh writes in the console's OEM code page, so its output is kept as bytes
+# and only the names we return are decoded
+NETSH_ENCODING = 'oem' if sys.platform == 'win32' else 'utf-8'
+
+# Field names the EE portal and the BT sign-in pages use for credentials
+USERNAME_FIELDS = ('loginfmt', 'username', 'email', 'user')
+PASSWORD_FIELDS = ('passwd', 'password', 'pwd')
+
+
+class _FormParser(HTMLParser):
+    """Collect every <form> on a page with its action, method and input fields."""
+    
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self.forms.append({
+                'action': attrs.get('action') or '',
+                'method': (attrs.get('method') or 'get').lower(),
+                'inputs': []
+            })
+        elif tag in ('input', 'button') and self.forms:
+            if tag == 'button':
+                # A <button> without a type submits its form
+                attrs.setdefault('type', 'submit')
+            self.forms[-1]['inputs'].append(attrs)
+
+
+class RunResult(IntEnum):
+    """Outcome of WiFiHotspotAgent.run(), used as the process exit code."""
+    ONLINE = 0
+    ERROR = 1
+    NO_HOTSPOT = 2
+    LOGIN_FAILED = 3
+
 
 class WiFiHotspotAgent:
     """Main class for WiFi hotspot automation."""
     
-    def __init__(self, config_file: str = "wifi_config.json", headless: bool = None):
+    # Evaluates selectors in priority order inside the page and returns the first
+    # visible, enabled match with the selector that found it, so a whole fallback
+    # list costs one round-trip.
+    # Selectors starting with "/" or "(" are XPath (needed for text matches);
+    # the rest are CSS, which the browser resolves without the XPath engine.
+    # An invalid selector is skipped rather than failing the whole lookup.
+    _FIRST_VISIBLE_FN = """
+        function matches(selector) {
+            var first = selector.charAt(0);
+            if (first !== '/' && first !== '(') {
+                return Array.prototype.slice.call(document.querySelectorAll(selector));
+            }
+            var result = document.evaluate(selector, document, null,
+                                           XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var nodes = [];
+            for (var j = 0; j < result.snapshotLength; j++) {
+                nodes.push(result.snapshotItem(j));
+            }
+            return nodes;
+        }
+        function firstVisible(selectors) {
+            for (var i = 0; i < selectors.length; i++) {
+                var nodes;
+                try {
+                    nodes = matches(selectors[i]);
+                } catch (e) {
+                    continue;
+                }
+                for (var j = 0; j < nodes.length; j++) {
+                    var el = nodes[j];
+                    if (el.getClientRects().length && !el.disabled &&
+                            getComputedStyle(el).visibility !== 'hidden') {
+                        return {el: el, selector: selectors[i]};
+                    }
+                }
+            }
+            return null;
+        }
+    """
+    # The match is centred in the viewport in the same call, so the WebDriver click
+    # that follows lands on it rather than on a sticky cookie banner or footer
+    _FIRST_VISIBLE_JS = _FIRST_VISIBLE_FN + """
+        var match = firstVisible(arguments[0]);
+        if (match) {
+            match.el.scrollIntoView({block: 'center', inline: 'center'});
+        }
+        return match;
+    """
+    
+    # Runs a list of click stages in the page, each waiting up to its own timeout
+    # for a match. Optional stages are skipped when nothing appears. A
+    # MutationObserver re-checks the current stage as soon as the DOM changes,
+    # with a slow poll as a backstop for elements revealed by CSS alone. The
+    # result is reported before the final click so a navigation can't swallow
+    # it, along with the selector that matched at each stage.
+    _CLICK_SEQUENCE_JS = _FIRST_VISIBLE_FN + """
+        var stages = arguments[0], done = arguments[arguments.length - 1];
+        var i = 0, hits = [], finished = false, pending = false, deadline = null;
+        var observer = new MutationObserver(schedule);
+        var backstop = setInterval(step, 250);
+        function finish(result) {
+            finished = true;
+            observer.disconnect();
+            clearInterval(backstop);
+            clearTimeout(deadline);
+            done(result);
+        }
+        function schedule() {
+            if (!pending && !finished) {
+                pending = true;
+                setTimeout(function () { pending = false; step(); }, 0);
+            }
+        }
+        function startStage() {
+            clearTimeout(deadline);
+            deadline = setTimeout(expire, stages[i].timeout);
+            step();
+        }
+        function expire() {
+            if (finished) {
+                return;
+            }
+            if (stages[i].required) {
+                return finish({ok: false, stage: stages[i].name, hits: hits});
+            }
+            advance(null);
+        }
+        function step() {
+            if (finished) {
+                return;
+            }
+            var match = firstVisible(stages[i].selectors);
+            if (match) {
+                advance(match);
+            }
+        }
+        function advance(match) {
+            var stage = stages[i], el = match && match.el;
+            hits[i] = match ? match.selector : null;
+            i++;
+            if (i >= stages.length) {
+                finish({ok: !!el, stage: stage.name, hits: hits});
+                if (el) {
+                    setTimeout(function () { el.click(); }, 0);
+                }
+                return;
+            }
+            if (el) {
+                el.click();
+            }
+            startStage();
+        }
+        observer.observe(document, {childList: true, subtree: true, attributes: true,
+                                    attributeFilter: ['class', 'style', 'hidden', 'disabled']});
+        startStage();
+    """
+    
+    # Registered to run before a sign-in page's own scripts: fills the email and
+    # password fields as soon as they are added to the DOM, only on the given
+    # host. The native value setter plus input/change events keep page
+    # frameworks in sync, as if the user had typed.
+    _AUTOFILL_JS = """
+        (function (cfg) {
+            if (location.hostname !== cfg.host) {
+                return;
+            }
+            var setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+            function fill() {
+                var pending = 0;
+                cfg.fields.forEach(function (field) {
+                    if (field.done) {
+                        return;
+                    }
+                    var el = document.querySelector(field.selector);
+                    if (!el) {
+                        pending++;
+                        return;
+                    }
+                    setter.call(el, field.value);
+                    el.dispatchEvent(new Event('input', {bubbles: true}));
+                    el.dispatchEvent(new Event('change', {bubbles: true}));
+                    field.done = true;
+                });
+                return pending === 0;
+            }
+            new MutationObserver(function (mutations, observer) {
+                if (fill()) {
+                    observer.disconnect();
+                }
+            }).observe(document, {childList: true, subtree: true});
+        })(%s);
+    """
+    
+    # Sets an input's value the way typing would, for _set_value
+    _SET_VALUE_JS = """
+        var el = arguments[0];
+        Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set.call(el, arguments[1]);
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    """
+    
+    # How long to look for optional elements (ones with a fallback or that a
+    # portal may simply not show) before moving on
+    _PROBE_TIMEOUT = 1
+    
+    # Selector fallback lists, most specific first. EE portal landing page
+    _COOKIE_SELECTORS = (
+        "button[class*='btn--acceptAll']",
+        "//button[contains(text(), 'Accept all cookies')]",
+        "//button[contains(text(), 'OK')]",
+        "//button[contains(text(), 'Accept')]",
+        "//button[contains(text(), 'Accept All')]",
+        "//button[contains(text(), 'I Accept')]",
+        "//a[contains(text(), 'Accept')]",
+    )
+    _LOGIN_SELECTORS = (
+        "a#customer-login",
+        "//button[contains(text(), 'Log in now')]",
+        "//button[contains(text(), 'Login')]",
+        "//button[contains(text(), 'Sign in')]",
+        "//a[contains(text(), 'Log in')]",
+        "//a[contains(text(), 'Login')]",
+    )
+    _BT_TAB_SELECTORS = (
+        "button#customer-login-btbb",
+        "//button[contains(text(), 'BT Business Broadband')]",
+        "//button[contains(text(), 'BT Business')]",
+        "//a[contains(text(), 'BT Business')]",
+        "//div[contains(text(), 'BT Business')]",
+    )
+    _EE_SUBMIT_SELECTORS = (
+        "input#submit-btb",
+        "//button[contains(text(), 'Click here to log in')]",
+        "input[type='submit']",
+        "button[type='submit']",
+        "//button[contains(text(), 'Log in')]",
+        "//button[contains(text(), 'Sign in')]",
+        "//button[contains(text(), 'Login')]",
+    )
+    
+    # BT sign-in pages reached after the EE submit
+    _USERNAME_SELECTORS = (
+        # Standard input selectors
+        "input[type='text'], input[type='email'], input[name='username'], input[name='email'], input#username, input#email",
+        "input[placeholder*='username'], input[placeholder*='email'], input[placeholder*='Username'], input[placeholder*='Email']",
+        # BT-specific selectors
+        "input[name='loginfmt']",     # Microsoft/BT OAuth2 email field
+        "input#loginfmt",             # Microsoft/BT OAuth2 email field
+        "input[name='email']",        # Generic email field
+        "input#email",                # Generic email field
+        "input[type='email']",        # HTML5 email input
+        "input[class*='email']",      # Email class-based selector
+        "input[class*='username']",   # Username class-based selector
+        # More specific BT OAuth2 selectors
+        "input[data-bind*='email']",
+        "input[data-bind*='username']",
+        "input[aria-label*='email'], input[aria-label*='Email']",
+        "input[aria-label*='username'], input[aria-label*='Username']",
+    )
+    _NEXT_SELECTORS = (
+        # Standard button text selectors
+        "//button[contains(text(), 'Next')]",
+        "//button[contains(text(), 'Continue')]",
+        "//button[contains(text(), 'Proceed')]",
+        "//button[contains(text(), 'Sign in')]",
+        "//button[contains(text(), 'Login')]",
+        "//button[contains(text(), 'Submit')]",
+        # BT/Microsoft OAuth2 specific selectors
+        "input[type='submit']",
+        "button[type='submit']",
+        "input[value='Next']",
+        "input[value='Continue']",
+        "input[value='Sign in']",
+        "input[value='Login']",
+        # ID and class-based selectors
+        "button#idSIButton9",           # Microsoft OAuth2 Next button
+        "input#idSIButton9",            # Microsoft OAuth2 Next button
+        "button[class*='btn-primary']",
+        "button[class*='btn-submit']",
+        "button[class*='next']",
+        "button[class*='continue']",
+        # Data attribute selectors
+        "button[data-bind*='next']",
+        "button[data-bind*='continue']",
+        "button[data-bind*='submit']",
+        # Aria-label selectors
+        "button[aria-label*='Next'], button[aria-label*='Continue']",
+        "input[aria-label*='Next'], input[aria-label*='Continue']",
+        # Form submission selectors
+        "form button[type='submit']",
+        "form input[type='submit']",
+    )
+    _PASSWORD_SELECTORS = (
+        # Standard password selectors
+        "input[type='password']",
+        "input[name='password']",
+        "input#password",
+        # BT/Microsoft OAuth2 specific selectors
+        "input[name='passwd']",        # Microsoft OAuth2 password field
+        "input#passwd",                # Microsoft OAuth2 password field
+        "input[name='pwd']",           # Alternative password field name
+        "input#pwd",                   # Alternative password field ID
+        # Class and attribute-based selectors
+        "input[class*='password']",
+        "input[class*='pwd']",
+        "input[placeholder*='password'], input[placeholder*='Password']",
+        "input[aria-label*='password'], input[aria-label*='Password']",
+        # Data attribute selectors
+        "input[data-bind*='password']",
+        "input[data-bind*='pwd']",
+    )
+    _FINAL_SUBMIT_SELECTORS = (
+        # BT-specific: Next button is used for final submission
+        "//button[contains(text(), 'Next')]",
+        "button#next",
+        "input#next",
+        # Standard button text selectors
+        "//button[contains(text(), 'Sign in')]",
+        "//button[contains(text(), 'Login')]",
+        "//button[contains(text(), 'Submit')]",
+        "//button[contains(text(), 'Sign In')]",
+        "//button[contains(text(), 'Log In')]",
+        "//button[contains(text(), 'Continue')]",
+        # BT/Microsoft OAuth2 specific selectors
+        "input[type='submit']",
+        "button[type='submit']",
+        "input[value='Sign in']",
+        "input[value='Login']",
+        "input[value='Submit']",
+        "input[value='Continue']",
+        "input[value='Next']",
+        # ID and class-based selectors
+        "button#idSIButton9",           # Microsoft OAuth2 submit button
+        "input#idSIButton9",            # Microsoft OAuth2 submit button
+        "button[class*='btn-primary']",
+        "button[class*='btn-submit']",
+        "button[class*='btn-signin']",
+        "button[class*='btn-login']",
+        # Data attribute selectors
+        "button[data-bind*='submit']",
+        "button[data-bind*='signin']",
+        "button[data-bind*='login']",
+        # Aria-label selectors
+        "button[aria-label*='Sign in'], button[aria-label*='Login']",
+        "input[aria-label*='Sign in'], input[aria-label*='Login']",
+        # Form submission selectors
+        "form button[type='submit']",
+        "form input[type='submit']",
+    )
+    
+    # Extra fields some EE portal variants show on the landing page
+    _EE_USERNAME_SELECTORS = ("input[type='text'], input[type='email'], input[name='username'], input[name='email']",)
+    _EE_PASSWORD_SELECTORS = ("input[type='password']",)
+    _EE_NEXT_SELECTORS = (
+        "//button[contains(text(), 'Next')]",
+        "//button[contains(text(), 'Continue')]",
+        "input[type='submit']",
+        "button[type='submit']",
+    )
+    _EE_FINAL_SUBMIT_SELECTORS = (
+        "//button[contains(text(), 'Sign in')]",
+        "//button[contains(text(), 'Login')]",
+        "//button[contains(text(), 'Submit')]",
+        "input[type='submit']",
+        "button[type='submit']",
+    )
+    _EE_BUTTON_SELECTORS = (
+        "//button[contains(text(), 'Continue')]",
+        "//button[contains(text(), 'Next')]",
+        "//button[contains(text(), 'Proceed')]",
+        "//button[contains(text(), 'Submit')]",
+        "input[type='submit']",
+        "button[type='submit']",
+    )
+    # All of the above in one lookup, fields before buttons
+    _EE_EXTRA_SELECTORS = _EE_USERNAME_SELECTORS + _EE_PASSWORD_SELECTORS + _EE_BUTTON_SELECTORS
+    
+    # Direct BT OAuth2 authorization pages
+    _OAUTH_EMAIL_SELECTORS = (
+        "input[name='loginfmt']",        # Microsoft OAuth2 email field
+        "input#loginfmt",                # Microsoft OAuth2 email field
+        "input[type='email']",           # HTML5 email input
+        "input[name='email']",           # Generic email field
+        "input#email",                   # Generic email field
+        "input[type='text'][placeholder*='email']",
+        "input[type='text'][placeholder*='Email']",
+        "input[type='text'][placeholder*='username']",
+        "input[type='text'][placeholder*='Username']",
+    )
+    _OAUTH_NEXT_SELECTORS = (
+        "input[type='submit']",
+        "button[type='submit']",
+        "input[value='Next']",
+        "//button[contains(text(), 'Next')]",
+        "input#idSIButton9",
+        "button#idSIButton9",
+    )
+    _OAUTH_PASSWORD_SELECTORS = (
+        "input[name='passwd']",          # Microsoft OAuth2 password field
+        "input#passwd",                  # Microsoft OAuth2 password field
+        "input[type='password']",        # Standard password field
+        "input[name='password']",        # Generic password field
+        "input#password",                # Generic password field
+    )
+    _OAUTH_SUBMIT_SELECTORS = (
+        # BT-specific: Next button is used for final submission
+        "//button[contains(text(), 'Next')]",
+        "button#next",
+        "input#next",
+        # Standard submit selectors
+        "input[type='submit']",
+        "button[type='submit']",
+        "input[value='Sign in']",
+        "//button[contains(text(), 'Sign in')]",
+        "input#idSIButton9",
+        "button#idSIButton9",
+    )
+    
+    # Button texts accepted on click-through portals
+    _CLICK_THROUGH_TEXTS = (
+        "Accept", "Agree", "Continue", "I Agree", "Accept Terms",
+        "Get Started", "Connect", "Login", "Sign In",
+    )
+    _CLICK_THROUGH_XPATHS = tuple(
+        f"//button[contains(text(), '{text}')] | //a[contains(text(), '{text}')]"
+        for text in _CLICK_THROUGH_TEXTS
+    )
+    
+    # Generic form pages
+    _FORM_SUBMIT_SELECTORS = ("button[type='submit']", "input[type='submit']")
+    
+    # Signs that a page has moved on: a sign-in field after the EE submit, an
+    # outcome message after the final submit
+    _SIGN_IN_FIELD_CSS = "input[name='loginfmt'], input#loginfmt, input[type='password']"
+    _OUTCOME_XPATH = "//*[contains(text(), 'error') or contains(text(), 'success')]"
+    
+    # Lowercase URL fragments that mark a failed sign-in
+    _FAILURE_URL_TOKENS = ("error", "fail")
+    
+    def __init__(self, config_file: str = "wifi_config.json", headless: bool = None,
+                 session: Optional[requests.Session] = None, debug: bool = None):
         """Initialize the WiFi agent with configuration.
         
         Args:
             config_file: Path to the configuration file
             headless: If True, run browser invisibly. If False, show browser for debugging.
                      If None, read from config file.
+            session: requests session to reuse for the HTTP login path
+            debug: If True, save screenshots of the login pages. If None, read
+                   debug_mode from config file.
         """
         self.config_file = config_file
+        # A session passed in belongs to the caller; one made here is closed by close()
+        self._owns_session = session is None
+        if session is None:
+            # Keep-alive session so repeat probes and portal requests reuse connections
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+            session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self._session = session
+        self._probe_pool = ThreadPoolExecutor(max_workers=len(TEST_URLS))
+        # Writes debug screenshots to disk; only created in debug mode
+        self._debug_pool = None
+        # Per selector list, how often each selector found the element
+        self._selector_hits = self._load_selector_stats()
+        self._selector_stats_dirty = False
+        # SSID -> {'ok': n, 'fail': n} from earlier portal logins
+        self._hotspot_stats = self._load_hotspot_stats()
+        self._driver = None
+        self._profile_dir = None
+        atexit.register(self.close)
+        # argv tuple -> (monotonic time, CompletedProcess) for recent netsh calls
+        self._netsh_cache = {}
+        # (monotonic time, profile names) from the last get_available_networks
+        self._networks_cache = (None, ())
+        # Why the last run() ended the way it did
+        self.last_result = RunResult.ERROR
+        self._connectivity_cache = (None, None)
+        # Whether the host has a WiFi interface at all; looked up on first use
+        self._has_wlan = None
         self.setup_logging()
         self.config = self._load_config()
         
+        # Positive connectivity results are reused briefly, keyed on the current SSID;
+        # "connectivity_cache_ttl": 0 in the config probes every time
+        self.connectivity_cache_ttl = self.config.get('connectivity_cache_ttl', 10)
+        
+        if self.config.get('dns_cache', True):
+            _install_dns_cache()
+            
+        self.debug = self.config.get('debug_mode', False) if debug is None else debug
+        if self.debug:
+            self._debug_pool = ThreadPoolExecutor(max_workers=1)
+            
+        # Native WiFi API instead of netsh where available; "use_wlanapi": false forces netsh
+        self.use_wlanapi = _wlan.WLAN_AVAILABLE and self.config.get('use_wlanapi', True)
+        
         # Set headless mode from config if not specified
         if headless is None:
             self.headless = self.config.get('headless_browser', True)
@@ -47,22 +696,52 @@ class WiFiHotspotAgent:
             self.logger.info("Debug mode enabled - browser will be visible")
         
     def setup_logging(self):
-        """Setup logging configuration."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('wifi_agent.log'),
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        """Setup logging configuration.
+        
+        Callers log into a queue and a background thread writes the file and
+        console, so a login never waits on disk I/O. Like basicConfig, this does
+        nothing if logging was already configured, e.g. by the monitor.
+        """
+        if logging.getLogger().handlers:
+            self.logger = logging.getLogger(__name__)
+            return
+            
+        log_format = '%(asctime)s - %(levelname)s - %(message)s'
+        formatter = logging.Formatter(log_format)
+        file_handler = logging.FileHandler('wifi_agent.log', encoding='utf-8', delay=True)
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+        
+        global _log_listener
+        log_queue = queue.SimpleQueue()
+        _log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+        _log_listener.start()
+        # Registered after logging's own shutdown hook, so it runs first and
+        # drains the queue before the handlers are closed
+        atexit.register(_log_listener.stop)
+        
+        # The QueueHandler passes the bare message on and the listener's
+        # handlers add the timestamp and level
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
         self.logger = logging.getLogger(__name__)
         
-    def _load_config(self) -> Dict:
-        """Load configuration from JSON file."""
+    def _load_config(self) -> Mapping:
+        """Load configuration from JSON file.
+        
+        The result is shared between agents while the file is unchanged, so it
+        is returned read-only.
+        """
         try:
-            with open(self.config_file, 'r') as f:
-                config = json.load(f)
+            key = (os.path.abspath(self.config_file), os.stat(self.config_file).st_mtime_ns)
+            config = _config_cache.get(key)
+            if config is None:
+                with open(self.config_file, 'rb') as f:
+                    config = MappingProxyType(_json_loads(f.read()))
+                _config_cache.clear()
+                _config_cache[key] = config
             self.logger.info(f"Configuration loaded from {self.config_file}")
             return config
         except FileNotFoundError:
@@ -73,21 +752,97 @@ class WiFiHotspotAgent:
             self.logger.error(f"Invalid JSON in configuration file: {e}")
             sys.exit(1)
             
-    def get_available_networks(self) -> List[str]:
-        """Get list of available WiFi networks."""
+    def _run_netsh(self, args: List[str], ttl: float = 1.0) -> subprocess.CompletedProcess:
+        """Run a netsh command, reusing a result younger than ttl seconds.
+        
+        stdout is left as bytes; decode with NETSH_ENCODING. Raises
+        subprocess.CalledProcessError like subprocess.run(check=True);
+        failures are not cached.
+        """
+        key = tuple(args)
+        now = time.monotonic()
+        cached = self._netsh_cache.get(key)
+        if cached and now - cached[0] < ttl:
+            return cached[1]
+            
+        result = subprocess.run(
+            ['netsh', *args],
+            capture_output=True,
+            check=True
+        )
+        self._netsh_cache[key] = (now, result)
+        return result
+        
+    def _current_ssid(self) -> Optional[str]:
+        """Return the SSID of the connected WiFi interface, if any."""
+        if self.use_wlanapi:
+            try:
+                return _wlan.current_ssid()
+            except OSError as e:
+                self.logger.debug("WlanAPI SSID query failed, falling back to netsh: %s", e)
+                
+        try:
+            match = _SSID_RE.search(self._run_netsh(['wlan', 'show', 'interfaces'], ttl=10).stdout)
+            return match.group(1).decode(NETSH_ENCODING, errors='replace') if match else None
+        except (subprocess.CalledProcessError, OSError):
+            return None
+            
+    def _wlan_present(self) -> bool:
+        """Return whether the host has a WiFi interface, remembered for the agent's lifetime.
+        
+        Ethernet + AP hosts have none, so their connectivity checks skip the SSID query.
+        """
+        if self._has_wlan is None:
+            self._has_wlan = self._detect_wlan()
+            if not self._has_wlan:
+                self.logger.info("No WiFi interface found - connectivity checks will not track the SSID")
+        return self._has_wlan
+        
+    def _detect_wlan(self) -> bool:
+        """Look for a WiFi interface through WlanAPI or netsh."""
+        if self.use_wlanapi:
+            try:
+                return bool(_wlan._interfaces())
+            except OSError as e:
+                self.logger.debug("WlanAPI interface query failed, falling back to netsh: %s", e)
+                
         try:
-            result = subprocess.run(
-                ['netsh', 'wlan', 'show', 'profiles'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            networks = []
-            for line in result.stdout.split('\n'):
-                if 'All User Profile' in line:
-                    network = line.split(':')[1].strip()
-                    networks.append(network)
+            result = self._run_netsh(['wlan', 'show', 'interfaces'], ttl=10)
+            return _INTERFACE_GUID_RE.search(result.stdout) is not None
+        except (subprocess.CalledProcessError, OSError):
+            # netsh fails outright when the WLAN service isn't running
+            return False
+            
+    def get_available_networks(self, force: bool = False) -> List[str]:
+        """Get list of available WiFi networks.
+        
+        The saved profiles rarely change, so a list younger than
+        NETWORKS_CACHE_TTL seconds is reused unless force is set.
+        """
+        listed_at, networks = self._networks_cache
+        if not force and listed_at is not None and time.monotonic() - listed_at < NETWORKS_CACHE_TTL:
+            return list(networks)
+            
+        networks = self._list_networks()
+        if networks:
+            self._networks_cache = (time.monotonic(), tuple(networks))
+        return networks
+        
+    def _list_networks(self) -> List[str]:
+        """Query the saved WiFi profiles through WlanAPI or netsh."""
+        if self.use_wlanapi:
+            try:
+                networks = _wlan.profile_names()
+                self.logger.info(f"Found {len(networks)} available networks")
+                return networks
+            except OSError as e:
+                self.logger.warning(f"WlanAPI profile query failed, falling back to netsh: {e}")
+                
+        try:
+            result = self._run_netsh(['wlan', 'show', 'profiles'])
+            
+            networks = [name.decode(NETSH_ENCODING, errors='replace')
+                        for name in _PROFILE_RE.findall(result.stdout)]
                     
             self.logger.info(f"Found {len(networks)} available networks")
             return networks
@@ -102,73 +857,176 @@ class WiFiHotspotAgent:
             self.logger.info(f"Attempting to connect to {ssid}")
             
             # Try to connect to the network
-            result = subprocess.run(
-                ['netsh', 'wlan', 'connect', f'name={ssid}'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # Wait a moment for connection
-            time.sleep(5)
+            if not self._wlan_connect(ssid):
+                subprocess.run(
+                    ['netsh', 'wlan', 'connect', f'name={ssid}'],
+                    capture_output=True,
+                    check=True
+                )
+            # The connection state just changed, so earlier netsh answers are stale
+            self._netsh_cache.clear()
+            
+            # Poll every 100ms until the connection is up instead of always waiting
+            # the full time; each poll reads fresh state rather than a cached netsh answer
+            deadline = time.monotonic() + 5
+            connected = self._is_connected_to_network(ssid, ttl=0)
+            while not connected and time.monotonic() < deadline:
+                time.sleep(0.1)
+                connected = self._is_connected_to_network(ssid, ttl=0)
             
             # Check if connection was successful
-            if self._is_connected_to_network(ssid):
+            if connected:
                 self.logger.info(f"Successfully connected to {ssid}")
                 return True
             else:
                 self.logger.warning(f"Failed to connect to {ssid}")
+                # The profile may have gone; list the networks afresh next time
+                self._networks_cache = (None, ())
                 return False
                 
-        except subprocess.CalledProcessError as e:
+        except (subprocess.CalledProcessError, OSError) as e:
             self.logger.error(f"Error connecting to {ssid}: {e}")
             return False
             
-    def _is_connected_to_network(self, ssid: str) -> bool:
-        """Check if currently connected to a specific network."""
+    def _wlan_connect(self, ssid: str) -> bool:
+        """Start a connection through WlanAPI; False means use netsh instead."""
+        if not self.use_wlanapi:
+            return False
         try:
-            result = subprocess.run(
-                ['netsh', 'wlan', 'show', 'interfaces'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            _wlan.connect(ssid)
+            return True
+        except OSError as e:
+            self.logger.warning(f"WlanAPI connect failed, falling back to netsh: {e}")
+            return False
+            
+    def _is_connected_to_network(self, ssid: str, ttl: float = 1.0) -> bool:
+        """Check if currently connected to a specific network.
+        
+        ttl is how old a cached netsh answer may be; WlanAPI is always queried live.
+        """
+        if self.use_wlanapi:
+            try:
+                return ssid in _wlan.connected_ssids()
+            except OSError as e:
+                self.logger.debug("WlanAPI connection query failed, falling back to netsh: %s", e)
+                
+        try:
+            result = self._run_netsh(['wlan', 'show', 'interfaces'], ttl=ttl)
             
-            return ssid in result.stdout
+            # Exact SSIDs from the one regex pass; a substring test would take
+            # "BTWiFi-with-FON" for "BTWiFi"
+            return ssid.encode(NETSH_ENCODING, errors='replace') in set(_SSID_RE.findall(result.stdout))
             
         except subprocess.CalledProcessError:
             return False
             
     def check_internet_connectivity(self) -> bool:
-        """Check if internet is accessible."""
-        import requests
+        """Check if internet is accessible.
         
-        test_urls = [
-            'http://www.google.com',  # Use HTTP first for captive portal detection
-            'https://8.8.8.8',
-            'https://1.1.1.1',
-            'https://www.google.com'
-        ]
+        A positive result is reused for connectivity_cache_ttl seconds while the
+        SSID is unchanged; negative results are never cached, so the check that
+        follows a login attempt always probes again.
+        """
+        ssid = self._current_ssid() if self._wlan_present() else None
+        checked_at, cached_ssid = self._connectivity_cache
+        if checked_at is not None and cached_ssid == ssid and \
+                time.monotonic() - checked_at < self.connectivity_cache_ttl:
+            return True
+            
+        if self._probe_connectivity():
+            self._connectivity_cache = (time.monotonic(), ssid)
+            return True
+        self._connectivity_cache = (None, None)
+        # Cached answers may have come from a captive portal's DNS
+        _dns_cache.clear()
+        return False
         
-        for url in test_urls:
-            try:
-                self.logger.debug(f"Testing connectivity to {url}")
-                response = requests.get(url, timeout=3, allow_redirects=False)
-                self.logger.debug(f"Response status: {response.status_code}")
-                if response.status_code == 200:
-                    self.logger.info(f"Internet connectivity confirmed via {url}")
+    def _probe_connectivity(self) -> bool:
+        """Probe the test URLs and return True on the first expected answer."""
+        # Probe every URL at once; the first expected answer settles it
+        futures = {self._probe_pool.submit(self._probe_url, *test): test[0] for test in TEST_URLS}
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    self.logger.info(f"Internet connectivity confirmed via {futures[future]}")
                     return True
-            except Exception as e:
-                self.logger.debug(f"Failed to connect to {url}: {e}")
-                continue
+        finally:
+            for future in futures:
+                future.cancel()
                 
         self.logger.info("No internet connectivity detected")
         return False
         
-    def _try_local_driver(self) -> Optional[Service]:
-        """Try to use the local ChromeDriver in the current directory."""
-        import os
+    def _probe_url(self, url: str, expected_status: int, expected_body: bytes) -> bool:
+        """Return True if url answers with expected_status and body without redirecting."""
+        try:
+            self.logger.debug("Testing connectivity to %s", url)
+            # The changing query and no-cache headers keep proxies from replaying an old answer
+            response = self._session.get(url, timeout=PROBE_TIMEOUT, allow_redirects=False,
+                                         headers=NO_CACHE_HEADERS, params={'_': time.time_ns()})
+            self.logger.debug("Response status from %s: %s", url, response.status_code)
+            return response.status_code == expected_status and \
+                response.content.strip() == expected_body
+        except requests.exceptions.RequestException as e:
+            self.logger.debug("Failed to connect to %s: %s", url, e)
+            return False
+        
+    @cached_property
+    def _chromedriver_path(self) -> Optional[str]:
+        """Path of the ChromeDriver to use, resolved once per agent.
+        
+        The last path that started Chrome is remembered in DRIVER_PATH_FILE so
+        later runs can skip the search; an empty file records that Selenium's
+        own lookup worked. None means let Selenium locate the driver.
+        """
+        try:
+            with open(DRIVER_PATH_FILE, 'r') as f:
+                remembered = f.read().strip()
+            if not remembered:
+                self.logger.info("Using Selenium's ChromeDriver lookup, as last time")
+                return None
+            if os.path.exists(remembered):
+                self.logger.info(f"Using remembered ChromeDriver at: {remembered}")
+                return remembered
+        except OSError:
+            pass
+            
+        # Try multiple approaches to get Chrome driver, stopping at the first hit.
+        # webdriver-manager goes last as it is the only one that may need the network
+        for attempt_func in (self._try_local_driver,
+                             self._try_cached_driver,
+                             self._try_chromedriver_in_path,
+                             self._try_webdriver_manager):
+            try:
+                driver_path = attempt_func()
+            except Exception as e:
+                self.logger.debug("Driver attempt failed: %s", e)
+                continue
+            if driver_path:
+                return driver_path
+                
+        self.logger.info("Trying system Chrome driver...")
+        return None
         
+    def _remember_chromedriver_path(self, driver_path: str):
+        """Store a ChromeDriver path that started Chrome, or "" for Selenium's lookup."""
+        try:
+            os.makedirs(os.path.dirname(DRIVER_PATH_FILE), exist_ok=True)
+            with open(DRIVER_PATH_FILE, 'w') as f:
+                f.write(driver_path)
+        except OSError as e:
+            self.logger.debug("Could not remember ChromeDriver path: %s", e)
+            
+    def _forget_chromedriver_path(self):
+        """Drop the resolved ChromeDriver path so the next start searches again."""
+        self.__dict__.pop('_chromedriver_path', None)
+        try:
+            os.remove(DRIVER_PATH_FILE)
+        except OSError:
+            pass
+            
+    def _try_local_driver(self) -> Optional[str]:
+        """Try to use the local ChromeDriver in the current directory."""
         try:
             self.logger.info("Trying local ChromeDriver...")
             
@@ -177,31 +1035,35 @@ class WiFiHotspotAgent:
             
             if os.path.exists(local_path):
                 self.logger.info(f"Found local ChromeDriver at: {local_path}")
-                return Service(local_path)
+                return local_path
             else:
                 self.logger.warning(f"Local ChromeDriver not found at: {local_path}")
                 return None
                 
-        except Exception as e:
+        except OSError as e:
             self.logger.warning(f"Error with local ChromeDriver: {e}")
             return None
         
-    def _try_webdriver_manager(self) -> Optional[Service]:
-        """Try to use webdriver-manager to get Chrome driver."""
+    def _try_webdriver_manager(self) -> Optional[str]:
+        """Try to use webdriver-manager to get Chrome driver.
+        
+        Runs offline by default (set WDM_OFFLINE=0 to allow downloads), since
+        the agent usually starts before the internet is reachable. Pin
+        "chromedriver_version" in the config to skip the version lookup.
+        """
         try:
-            self.logger.info("Trying webdriver-manager...")
-            driver_path = ChromeDriverManager().install()
-            return Service(driver_path)
+            self.logger.warning("No ChromeDriver found locally, trying webdriver-manager...")
+            os.environ.setdefault('WDM_OFFLINE', '1')
+            driver_version = self.config.get('chromedriver_version')
+            if driver_version:
+                return ChromeDriverManager(driver_version=driver_version).install()
+            return ChromeDriverManager().install()
         except Exception as e:
             self.logger.warning(f"WebDriver manager failed: {e}")
-            # Try to find cached driver manually
-            return self._try_cached_driver()
+            return None
     
-    def _try_cached_driver(self) -> Optional[Service]:
+    def _try_cached_driver(self) -> Optional[str]:
         """Try to find cached Chrome driver from webdriver-manager."""
-        import os
-        import glob
-        
         try:
             self.logger.info("Searching for cached Chrome driver...")
             
@@ -213,34 +1075,20 @@ class WiFiHotspotAgent:
             ]
             
             for cache_path in cache_paths:
-                if os.path.exists(cache_path):
-                    # Find the latest version
-                    version_dirs = glob.glob(os.path.join(cache_path, "*", "*"))
-                    if version_dirs:
-                        latest_dir = max(version_dirs, key=os.path.getmtime)
-                        driver_files = glob.glob(os.path.join(latest_dir, "**", "chromedriver.exe"), recursive=True)
-                        if driver_files:
-                            driver_path = driver_files[0]
-                            self.logger.info(f"Found cached driver at: {driver_path}")
-                            return Service(driver_path)
+                # Newest driver across all cached versions; a missing cache is skipped
+                driver_path = _find_newest(cache_path, "chromedriver.exe")
+                if driver_path:
+                    self.logger.info(f"Found cached driver at: {driver_path}")
+                    return driver_path
             
             self.logger.warning("No cached Chrome driver found")
             return None
             
-        except Exception as e:
+        except OSError as e:
             self.logger.warning(f"Error searching for cached driver: {e}")
             return None
     
-    def _try_system_chromedriver(self) -> Optional[Service]:
-        """Try to use system Chrome driver."""
-        try:
-            self.logger.info("Trying system Chrome driver...")
-            return Service()  # Let Selenium find chromedriver in PATH
-        except Exception as e:
-            self.logger.warning(f"System Chrome driver failed: {e}")
-            return None
-    
-    def _try_chromedriver_in_path(self) -> Optional[Service]:
+    def _try_chromedriver_in_path(self) -> Optional[str]:
         """Try to find chromedriver in common locations."""
         import shutil
         
@@ -249,237 +1097,647 @@ class WiFiHotspotAgent:
             chromedriver_path = shutil.which('chromedriver')
             if chromedriver_path:
                 self.logger.info(f"Found chromedriver at: {chromedriver_path}")
-                return Service(chromedriver_path)
+                return chromedriver_path
             else:
                 self.logger.warning("chromedriver not found in PATH")
                 return None
-        except Exception as e:
+        except OSError as e:
             self.logger.warning(f"PATH search failed: {e}")
             return None
         
-    def handle_captive_portal(self, hotspot_config: Dict) -> bool:
-        """Handle captive portal authentication."""
-        self.logger.info(f"Handling captive portal for {hotspot_config['ssid']}")
+    def _get_or_create_driver(self):
+        """Return the agent's Chrome instance, starting it on first use.
+        
+        Chrome startup dominates login time, so one browser is kept for the
+        life of the agent and reset between attempts rather than quit.
+        """
+        if self._driver is not None:
+            try:
+                self._driver.current_url  # Raises if the browser has gone away
+                return self._driver
+            except Exception:
+                self.logger.warning("Chrome instance stopped responding, starting a new one")
+                self._quit_driver()
+                
+        options = webdriver.ChromeOptions()
+        
+        # Always add these basic options
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-web-security')  # Disable web security for captive portals
+        options.add_argument('--allow-running-insecure-content')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+        # Content settings go in as prefs rather than one switch each; 2 = block.
+        # Images stay a headless-only switch below, and stylesheets stay on since
+        # some portal buttons are only visible with them
+        options.add_experimental_option('prefs', {
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.popups': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+            'profile.default_content_setting_values.plugins': 2,
+            'profile.default_content_setting_values.automatic_downloads': 2
+        })
+        # Return from navigation once the DOM is ready instead of waiting for
+        # every image and script on the portal page
+        options.page_load_strategy = 'eager'
         
+        if self.headless:
+            # Headless mode options
+            options.add_argument('--headless')  # Run browser invisibly
+            options.add_argument('--disable-gpu')  # Disable GPU for headless mode
+            options.add_argument('--window-size=1920,1080')  # Set window size for headless
+            options.add_argument('--disable-extensions')  # Disable extensions for headless
+            # Disable images for faster loading; a switch rather than a pref so it
+            # is not saved into the persistent profile used by visible mode
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_argument('--disable-background-timer-throttling')
+            options.add_argument('--disable-renderer-backgrounding')
+            # Chrome honours only the last --disable-features, so list them all here.
+            # Site isolation costs a renderer process per site, which a portal login doesn't need
+            options.add_argument('--disable-features=TranslateUI,CalculateNativeWinOcclusion,'
+                                 'RendererCodeIntegrity,IsolateOrigins,site-per-process')
+            options.add_argument('--disable-background-networking')
+            options.add_argument('--no-zygote')
+            options.add_argument('--disable-ipc-flooding-protection')
+            options.add_argument('--hide-scrollbars')
+            options.add_argument('--mute-audio')
+            self.logger.info("Running browser in headless (invisible) mode")
+        else:
+            # Visible mode options
+            options.add_argument('--window-size=1200,800')  # Reasonable window size for visible mode
+            self.logger.info("Running browser in visible mode for debugging")
+            
+        self._profile_dir = self._prepare_profile_dir()
+        if self._profile_dir:
+            options.add_argument(f'--user-data-dir={self._profile_dir}')
+            options.add_argument(f'--disk-cache-dir={os.path.join(self._profile_dir, "cache")}')
+            options.add_argument('--disk-cache-size=52428800')
+        
+        # The Service holds the driver process, so it is built fresh for each browser
+        driver_path = self._chromedriver_path
+        service = Service(driver_path) if driver_path else Service()
         try:
-            # Setup Chrome driver with multiple fallback options
-            service = None
-            driver = None
-            
-            # Try multiple approaches to get Chrome driver
-            driver_attempts = [
-                self._try_local_driver,
-                self._try_webdriver_manager,
-                self._try_system_chromedriver,
-                self._try_chromedriver_in_path
-            ]
+            self._driver = webdriver.Chrome(service=service, options=options)
+        except WebDriverException:
+            # A remembered driver may no longer match the installed Chrome
+            self._forget_chromedriver_path()
+            raise
+        self._remember_chromedriver_path(driver_path or '')
+        self._driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        # Explicit waits only: an implicit wait would stretch every empty lookup
+        self._driver.implicitly_wait(0)
+        self._block_urls(self._driver)
+        return self._driver
+        
+    def _navigate(self, driver, url: str):
+        """Open url, stopping the load instead of failing if it exceeds PAGE_LOAD_TIMEOUT."""
+        try:
+            driver.get(url)
+        except TimeoutException:
+            self.logger.warning(f"{url} still loading after {PAGE_LOAD_TIMEOUT}s, stopping it")
+            driver.execute_script("window.stop();")
+        
+    def _block_urls(self, driver):
+        """Stop the browser fetching BLOCKED_URL_PATTERNS for as long as it runs."""
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except WebDriverException as e:
+            self.logger.debug("Could not set blocked URLs: %s", e)
+        
+    def _prepare_profile_dir(self) -> Optional[str]:
+        """Return the Chrome profile directory to use, clearing a stale lock left by a crash.
+        
+        Falls back to a per-process directory when another Chrome holds the lock.
+        """
+        profile_dir = self.config.get('chrome_profile_dir', DEFAULT_PROFILE_DIR)
+        if not profile_dir:
+            return None
             
-            for attempt_func in driver_attempts:
-                try:
-                    service = attempt_func()
-                    if service:
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            for lock_name in ('SingletonLock', 'lockfile'):
+                lock_path = os.path.join(profile_dir, lock_name)
+                if os.path.lexists(lock_path):
+                    try:
+                        os.remove(lock_path)
+                    except OSError:
+                        self.logger.warning("Chrome profile is in use, using a private one for this run")
+                        # Throwaway, so it goes in the temp directory
+                        profile_dir = os.path.join(tempfile.gettempdir(), f"wifi_agent_chrome_{os.getpid()}")
+                        os.makedirs(profile_dir, exist_ok=True)
                         break
-                except Exception as e:
-                    self.logger.debug(f"Driver attempt failed: {e}")
-                    continue
-            
-            if not service:
-                raise Exception("Could not initialize Chrome driver with any method")
-            
-            options = webdriver.ChromeOptions()
-            
-            # Always add these basic options
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-web-security')  # Disable web security for captive portals
-            options.add_argument('--allow-running-insecure-content')
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option('useAutomationExtension', False)
-            
-            if self.headless:
-                # Headless mode options
-                options.add_argument('--headless')  # Run browser invisibly
-                options.add_argument('--disable-gpu')  # Disable GPU for headless mode
-                options.add_argument('--window-size=1920,1080')  # Set window size for headless
-                options.add_argument('--disable-extensions')  # Disable extensions for headless
-                options.add_argument('--disable-plugins')  # Disable plugins for headless
-                options.add_argument('--disable-images')  # Disable images for faster loading
-                options.add_argument('--disable-background-timer-throttling')
-                options.add_argument('--disable-backgrounding-occluded-windows')
-                options.add_argument('--disable-renderer-backgrounding')
-                options.add_argument('--disable-features=TranslateUI')
-                options.add_argument('--disable-ipc-flooding-protection')
-                options.add_argument('--hide-scrollbars')
-                options.add_argument('--mute-audio')
-                self.logger.info("Running browser in headless (invisible) mode")
-            else:
-                # Visible mode options
-                options.add_argument('--window-size=1200,800')  # Reasonable window size for visible mode
-                self.logger.info("Running browser in visible mode for debugging")
+            return profile_dir
+        except OSError as e:
+            self.logger.warning(f"Could not prepare Chrome profile directory: {e}")
+            return None
             
-            driver = webdriver.Chrome(service=service, options=options)
-            wait = WebDriverWait(driver, 1)
+    def _reset_driver(self):
+        """Return the browser to a blank page between attempts, quitting it if that fails.
+        
+        Without a persistent profile, cookies and cache are cleared as well so
+        the next attempt starts clean; with one, they are kept on purpose.
+        """
+        try:
+            if not self._profile_dir:
+                self._driver.delete_all_cookies()
+                self._driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            self._driver.get("about:blank")
+        except Exception as e:
+            self.logger.debug("Could not reset browser, closing it: %s", e)
+            self._quit_driver()
             
-            # Navigate to a test page to trigger captive portal
-            driver.get("http://www.google.com")
-            time.sleep(1)
+    def _quit_driver(self):
+        """Quit the kept Chrome instance, if any."""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+            self._driver = None
+            
+    def close(self):
+        """Release the browser and probe threads kept by the agent."""
+        atexit.unregister(self.close)
+        self._save_selector_stats()
+        self._quit_driver()
+        self._probe_pool.shutdown(wait=False, cancel_futures=True)
+        if self._owns_session:
+            self._session.close()
+        if self._debug_pool is not None:
+            # Let queued screenshots finish writing
+            self._debug_pool.shutdown(wait=True)
+        
+    def _debug_screenshot(self, driver, filename: str):
+        """Save a screenshot in debug mode, writing the file off the login path."""
+        if self._debug_pool is None:
+            return
+        try:
+            # The capture has to stay on this thread; WebDriver sessions aren't thread-safe
+            png = driver.get_screenshot_as_png()
+        except WebDriverException as e:
+            self.logger.debug("Could not take screenshot %s: %s", filename, e)
+            return
+        self._debug_pool.submit(self._write_screenshot, filename, png)
+        
+    def _write_screenshot(self, filename: str, png: bytes):
+        """Write a captured screenshot to disk."""
+        try:
+            with open(filename, 'wb') as f:
+                f.write(png)
+            self.logger.info(f"Screenshot saved as {filename}")
+        except OSError as e:
+            self.logger.warning(f"Could not save screenshot {filename}: {e}")
+        
+    def _run_click_sequence(self, driver, stages: List[Dict]) -> bool:
+        """Run click stages in the page with one WebDriver round-trip.
+        
+        Returns True once the last stage's element has been clicked.
+        """
+        keys = [_selector_list_key(stage['selectors']) for stage in stages]
+        stages = [dict(stage, selectors=self._ordered_selectors(key, stage['selectors']))
+                  for key, stage in zip(keys, stages)]
+        try:
+            driver.set_script_timeout(sum(stage['timeout'] for stage in stages) / 1000 + 5)
+            result = driver.execute_async_script(self._CLICK_SEQUENCE_JS, stages)
+        except WebDriverException as e:
+            self.logger.debug("In-page click sequence failed: %s", e)
+            return False
+            
+        for key, selector in zip(keys, (result or {}).get('hits') or []):
+            if selector:
+                self._record_selector_hit(key, selector)
+                
+        if result and result.get('ok'):
+            return True
+        self.logger.info(f"In-page click sequence stopped at stage: {result and result.get('stage')}")
+        return False
+        
+    def _wait_first_visible(self, driver, selectors: Tuple[str, ...], timeout: float = 10):
+        """Wait for the first visible, enabled element matching any of selectors.
+        
+        Selectors are tried in order, so earlier entries win when several match,
+        except that ones which matched in earlier runs are moved to the front.
+        Returns None if nothing appears within timeout.
+        """
+        key = _selector_list_key(selectors)
+        match = self._wait_first_match(driver, self._ordered_selectors(key, selectors), timeout)
+        if match is None:
+            return None
+        self._record_selector_hit(key, match['selector'])
+        return match['el']
+        
+    def _wait_first_match(self, driver, selectors, timeout: float = 10) -> Optional[Dict]:
+        """Like _wait_first_visible, but in the given order and returning
+        {'el', 'selector'} so the caller can tell which selector matched."""
+        try:
+            return WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+                lambda d: d.execute_script(self._FIRST_VISIBLE_JS, selectors))
+        except TimeoutException:
+            return None
+        
+    def _ordered_selectors(self, key: str, selectors) -> List[str]:
+        """Return selectors with the most frequent past matches first, ties in list order."""
+        hits = self._selector_hits.get(key)
+        if not hits:
+            return list(selectors)
+        return sorted(selectors, key=lambda selector: -hits[selector])
+        
+    def _record_selector_hit(self, key: str, selector: str):
+        """Count a match of selector in the list identified by key."""
+        self._selector_hits.setdefault(key, Counter())[selector] += 1
+        self._selector_stats_dirty = True
+        
+    def _load_selector_stats(self) -> Dict[str, Counter]:
+        """Read the selector match counts saved by earlier runs."""
+        try:
+            with open(SELECTOR_STATS_FILE, 'rb') as f:
+                return {key: Counter(hits) for key, hits in _json_loads(f.read()).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+            
+    def _save_selector_stats(self):
+        """Write the selector match counts for the next run, if they changed."""
+        if not self._selector_stats_dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(SELECTOR_STATS_FILE), exist_ok=True)
+            with open(SELECTOR_STATS_FILE, 'w') as f:
+                json.dump(self._selector_hits, f)
+            self._selector_stats_dirty = False
+        except OSError as e:
+            self.logger.debug("Could not save selector stats: %s", e)
+            
+    def _ordered_hotspots(self, hotspots) -> List[Dict]:
+        """Return hotspots with the best past login success rate first, ties in config order.
+        
+        The rate is smoothed so an untried hotspot ranks between ones that
+        usually work and ones that usually fail.
+        """
+        def success_rate(hotspot):
+            stats = self._hotspot_stats.get(hotspot.get('ssid'), {})
+            ok, fail = stats.get('ok', 0), stats.get('fail', 0)
+            return (ok + 1) / (ok + fail + 2)
+        return sorted(hotspots, key=lambda hotspot: -success_rate(hotspot))
+        
+    def _record_hotspot_result(self, ssid: str, success: bool):
+        """Count a login outcome for ssid and save the counts for the next run."""
+        stats = self._hotspot_stats.setdefault(ssid, {'ok': 0, 'fail': 0})
+        stats['ok' if success else 'fail'] += 1
+        try:
+            os.makedirs(os.path.dirname(HOTSPOT_STATS_FILE), exist_ok=True)
+            with open(HOTSPOT_STATS_FILE, 'w') as f:
+                json.dump(self._hotspot_stats, f)
+        except OSError as e:
+            self.logger.debug("Could not save hotspot stats: %s", e)
+            
+    def _load_hotspot_stats(self) -> Dict[str, Dict[str, int]]:
+        """Read the per-hotspot login counts saved by earlier runs."""
+        try:
+            with open(HOTSPOT_STATS_FILE, 'rb') as f:
+                stats = _json_loads(f.read())
+            return stats if isinstance(stats, dict) else {}
+        except (OSError, ValueError):
+            return {}
+            
+    def _set_value(self, driver, element, value: str):
+        """Fill an input in one round-trip instead of one command per keystroke.
+        
+        Falls back to typing if the page rejects the script.
+        """
+        try:
+            driver.execute_script(self._SET_VALUE_JS, element, value)
+        except WebDriverException as e:
+            self.logger.debug("Could not set field value by script, typing instead: %s", e)
+            element.clear()
+            element.send_keys(value)
+            
+    def _fill_field(self, driver, selectors, value: str, description: str, timeout: float = 10):
+        """Fill the first visible field matching selectors; returns it, or None if none appeared."""
+        field = self._wait_first_visible(driver, selectors, timeout)
+        if field:
+            self._set_value(driver, field, value)
+            self.logger.info(f"Filled {description} field")
+        return field
+        
+    def _click_any(self, driver, selectors, description: str, timeout: float = 10):
+        """Click the first visible element matching selectors; returns it, or None if none appeared."""
+        element = self._wait_first_visible(driver, selectors, timeout)
+        if element:
+            element.click()
+            self.logger.info(f"Clicked {description}")
+        return element
+        
+    def _press_enter(self, field, description: str):
+        """Submit by pressing Enter in a field, the fallback when no button is found."""
+        try:
+            field.send_keys("\n")
+            self.logger.info(f"Pressed Enter on {description} field")
+        except WebDriverException as e:
+            self.logger.debug("Could not press Enter on %s field: %s", description, e)
+            
+    def _sign_in(self, driver, config: Dict, username_selectors, next_selectors,
+                 password_selectors, submit_selectors) -> bool:
+        """Run a two-step sign-in page: username, Next, password, submit.
+        
+        Missing Next or submit buttons fall back to pressing Enter. Returns False
+        if a credential field never appears; otherwise waits for a redirect or an
+        outcome message after submitting and returns True.
+        """
+        username_field = self._fill_field(driver, username_selectors, config['username'], "username")
+        if not username_field:
+            self.logger.error("Could not find username field")
+            return False
+            
+        if not self._click_any(driver, next_selectors, "Next button", timeout=self._PROBE_TIMEOUT):
+            self.logger.warning("Could not find Next button, trying Enter key...")
+            self._press_enter(username_field, "username")
+            
+        # The password field has to be visible, since sign-in pages often carry
+        # it hidden on the username step already
+        password_field = self._fill_field(driver, password_selectors, config['password'], "password")
+        if not password_field:
+            self.logger.error("Could not find password field")
+            return False
+            
+        pre_submit_url = driver.current_url
+        if not self._click_any(driver, submit_selectors, "submit button", timeout=self._PROBE_TIMEOUT):
+            self.logger.warning("Could not find submit button, trying Enter key...")
+            self._press_enter(password_field, "password")
+            
+        # Wait for authentication to complete: a redirect or an outcome message
+        self._wait_until(driver, EC.any_of(
+            EC.url_changes(pre_submit_url),
+            EC.presence_of_element_located((By.XPATH, self._OUTCOME_XPATH))))
+        return True
+        
+    def _try_click(self, element, description: str) -> bool:
+        """Click an optional element, logging rather than failing if it can't be clicked."""
+        try:
+            element.click()
+            self.logger.info(f"Clicked {description}")
+            return True
+        except WebDriverException as e:
+            self.logger.debug("Could not click %s: %s", description, e)
+            return False
+            
+    def _wait_until(self, driver, condition, timeout: float = 10) -> bool:
+        """Wait for condition, returning as soon as it holds; False on timeout."""
+        try:
+            WebDriverWait(driver, timeout).until(condition)
+            return True
+        except TimeoutException:
+            return False
+            
+    def _wait_for_page_load(self, driver, timeout: float = 10) -> bool:
+        """Wait until the current document has been parsed.
+        
+        Matches the eager page load strategy: the DOM is ready to query while
+        subresources may still be arriving.
+        """
+        return self._wait_until(
+            driver, lambda d: d.execute_script("return document.readyState") != "loading", timeout)
+        
+    def login_via_http(self, hotspot_config: Dict, portal_url: Optional[str] = None) -> bool:
+        """Log in to a captive portal with plain HTTP form posts.
+        
+        Walks the portal's forms (for BT Business the EE landing page, then any
+        BT sign-in pages), filling credentials where asked and accepting terms
+        on click-through pages, without starting a browser. Returns False when
+        the portal needs something only a browser can do.
+        """
+        login_type = hotspot_config['login_type']
+        portal_url = portal_url or hotspot_config.get('portal_url', DEFAULT_PORTAL_URL)
+        self.logger.info(f"Trying HTTP login via {portal_url}")
+        
+        try:
+            response = self._session.get(portal_url, timeout=(3, 10))
+            
+            # EE page, then BT username and password steps at most
+            for _ in range(3):
+                form = self._pick_login_form(response.text, login_type)
+                if form is None:
+                    self.logger.info("No login form found on the portal page")
+                    return False
+                    
+                data = self._fill_form(form, hotspot_config, accept_terms=login_type == 'click_through')
+                action = urljoin(response.url, form['action'])
+                if form['method'] == 'post':
+                    response = self._session.post(action, data=data, timeout=(3, 10))
+                else:
+                    response = self._session.get(action, params=data, timeout=(3, 10))
+                self.logger.info(f"Submitted login form, now at {response.url}")
+                
+                if self.check_internet_connectivity():
+                    self.logger.info("HTTP login succeeded")
+                    return True
+                    
+            return False
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"HTTP login failed: {e}")
+            return False
+            
+    def _pick_login_form(self, html: str, login_type: str = 'bt_business') -> Optional[Dict]:
+        """Return the form to submit: the BT Business submit button's, one with
+        credential fields, or for click-through portals one that asks for nothing."""
+        parser = _FormParser()
+        parser.feed(html)
+        
+        for form in parser.forms:
+            if any(field.get('id') == 'submit-btb' for field in form['inputs']):
+                return form
+        for form in parser.forms:
+            names = {(field.get('name') or '').lower() for field in form['inputs']}
+            if names.intersection(USERNAME_FIELDS + PASSWORD_FIELDS):
+                return form
+        if login_type == 'click_through':
+            for form in parser.forms:
+                types = {(field.get('type') or 'text').lower() for field in form['inputs']}
+                if types and not types.intersection(('text', 'email', 'password')):
+                    return form
+        return None
+        
+    def _fill_form(self, form: Dict, config: Dict, accept_terms: bool = False) -> Dict:
+        """Build the POST body for a form: hidden tokens kept, credentials filled in.
+        
+        With accept_terms, checkboxes (terms and conditions) are ticked and the
+        first named submit button is sent, as if it had been clicked.
+        """
+        data = {}
+        clicked = not accept_terms
+        for field in form['inputs']:
+            name = field.get('name')
+            if not name:
+                continue
+            field_type = (field.get('type') or 'text').lower()
+            if not clicked and field_type in ('submit', 'image'):
+                data[name] = field.get('value', '')
+                clicked = True
+            elif name.lower() in USERNAME_FIELDS:
+                data[name] = config['username']
+            elif name.lower() in PASSWORD_FIELDS or field_type == 'password':
+                data[name] = config['password']
+            elif field_type == 'checkbox' and accept_terms:
+                data[name] = field.get('value', 'on')
+            elif field_type in ('checkbox', 'radio') and 'checked' not in field:
+                continue
+            elif field_type not in ('submit', 'button', 'image') or field.get('id') == 'submit-btb':
+                data[name] = field.get('value', '')
+        return data
+        
+    def _probe_portal(self) -> Tuple[bool, Optional[str]]:
+        """Check for a captive portal without a browser.
+        
+        Returns (True, None) when the network is already open, (False, url)
+        with the portal's address when one answered, and (False, None) when
+        the probe got no answer at all.
+        """
+        try:
+            response = self._session.get(PORTAL_PROBE_URL, timeout=2, allow_redirects=False,
+                                         headers=NO_CACHE_HEADERS)
+        except requests.exceptions.RequestException as e:
+            self.logger.debug("Portal probe failed: %s", e)
+            return False, None
+            
+        if response.status_code == 204 and not response.content:
+            return True, None
+            
+        location = response.headers.get('Location')
+        if response.is_redirect and location:
+            portal_url = urljoin(PORTAL_PROBE_URL, location)
+            self.logger.info(f"Captive portal detected at {portal_url}")
+            return False, portal_url
+            
+        # The portal answered the probe itself
+        self.logger.info(f"Captive portal detected (HTTP {response.status_code})")
+        return False, PORTAL_PROBE_URL
+        
+    def handle_captive_portal(self, hotspot_config: Dict) -> bool:
+        """Handle captive portal authentication."""
+        self.logger.info(f"Handling captive portal for {hotspot_config['ssid']}")
+        login_type = hotspot_config['login_type']
+        
+        # Nothing to log in to if the probe comes back clean
+        online, portal_url = self._probe_portal()
+        if online:
+            self.logger.info("No captive portal in the way - already online")
+            return True
+        if portal_url is None:
+            # Nothing answered the probe, so no portal intercepted it; only a
+            # configured portal address is worth opening
+            portal_url = hotspot_config.get('portal_url')
+            if not portal_url:
+                self.logger.warning("No response from the network and no portal_url configured - skipping login")
+                return False
+        
+        # Plain HTTP is far cheaper than starting Chrome; the browser is only
+        # launched once it has failed
+        if login_type in ('bt_business', 'form_based', 'click_through'):
+            if self.login_via_http(hotspot_config, portal_url):
+                return True
+            
+        try:
+            driver = self._get_or_create_driver()
+            # Go straight to the portal the probe found (or the configured one).
+            # With the eager strategy get() returns once the DOM is parsed; the
+            # wait only covers a script redirect
+            self._navigate(driver, portal_url)
+            self._wait_for_page_load(driver)
             
             # Check if we're redirected to a captive portal
             current_url = driver.current_url
             self.logger.info(f"Current URL: {current_url}")
             
-            if hotspot_config['login_type'] == 'bt_business':
-                success = self._handle_bt_business_login(driver, wait, hotspot_config)
-            elif hotspot_config['login_type'] == 'form_based':
-                success = self._handle_form_based_login(driver, wait, hotspot_config)
-            elif hotspot_config['login_type'] == 'click_through':
-                success = self._handle_click_through_login(driver, wait)
+            # Cookies in the persistent profile may still hold a valid portal session
+            if "google." in (urlsplit(current_url).hostname or "") and self.check_internet_connectivity():
+                self.logger.info("No captive portal in the way - already online")
+                self._reset_driver()
+                return True
+            
+            if login_type == 'bt_business':
+                success = self._handle_bt_business_login(driver, hotspot_config)
+            elif login_type == 'form_based':
+                success = self._handle_form_based_login(driver, hotspot_config)
+            elif login_type == 'click_through':
+                success = self._handle_click_through_login(driver)
             else:
-                self.logger.error(f"Unknown login type: {hotspot_config['login_type']}")
+                self.logger.error(f"Unknown login type: {login_type}")
                 success = False
                 
-            driver.quit()
+            self._reset_driver()
             return success
             
         except Exception as e:
             self.logger.error(f"Error handling captive portal: {e}")
+            # A failed login usually leaves a working browser; the reset quits it
+            # only if it no longer responds
+            self._reset_driver()
             return False
             
-    def _handle_bt_business_login(self, driver, wait, config) -> bool:
+    def _handle_bt_business_login(self, driver, config) -> bool:
         """Handle BT Business Broadband login flow."""
         try:
             self.logger.info("Starting BT Business login flow")
             
             # Take a screenshot for debugging
-            try:
-                driver.save_screenshot("captive_portal_debug.png")
-                self.logger.info("Screenshot saved as captive_portal_debug.png")
-            except:
-                pass
+            self._debug_screenshot(driver, "captive_portal_debug.png")
             
             # Wait a bit for page to load
-            time.sleep(0.5)
-            
-            # Accept cookies if present - handle EE WiFi cookie banner
-            try:
-                cookie_selectors = [
-                    "//button[contains(@class, 'btn--acceptAll')]",
-                    "//button[contains(text(), 'Accept all cookies')]",
-                    "//button[contains(text(), 'OK')]",
-                    "//button[contains(text(), 'Accept')]",
-                    "//button[contains(text(), 'Accept All')]",
-                    "//button[contains(text(), 'I Accept')]",
-                    "//a[contains(text(), 'Accept')]"
-                ]
-                
-                for selector in cookie_selectors:
-                    try:
-                        cookie_button = wait.until(
-                            EC.element_to_be_clickable((By.XPATH, selector))
-                        )
-                        cookie_button.click()
-                        self.logger.info("Clicked cookie acceptance button")
-                        time.sleep(0.5)
-                        break
-                    except:
-                        continue
-            except:
-                pass
-                
-            # Click "Log in now" button - use specific ID from EE WiFi
-            try:
-                login_selectors = [
-                    "//a[@id='customer-login']",
-                    "//button[contains(text(), 'Log in now')]",
-                    "//button[contains(text(), 'Login')]",
-                    "//button[contains(text(), 'Sign in')]",
-                    "//a[contains(text(), 'Log in')]",
-                    "//a[contains(text(), 'Login')]"
-                ]
-                
-                for selector in login_selectors:
-                    try:
-                        login_button = wait.until(
-                            EC.element_to_be_clickable((By.XPATH, selector))
-                        )
-                        login_button.click()
-                        self.logger.info("Clicked login button")
-                        time.sleep(0.5)
-                        break
-                    except:
-                        continue
-            except:
-                pass
-                
-            # Select BT Business Broadband tab - use specific ID from EE WiFi
-            try:
-                bt_selectors = [
-                    "//button[@id='customer-login-btbb']",
-                    "//button[contains(text(), 'BT Business Broadband')]",
-                    "//button[contains(text(), 'BT Business')]",
-                    "//a[contains(text(), 'BT Business')]",
-                    "//div[contains(text(), 'BT Business')]"
-                ]
-                
-                for selector in bt_selectors:
-                    try:
-                        bt_tab = wait.until(
-                            EC.element_to_be_clickable((By.XPATH, selector))
-                        )
-                        bt_tab.click()
-                        self.logger.info("Clicked BT Business tab")
-                        time.sleep(0.5)
-                        break
-                    except:
-                        continue
-            except:
-                pass
-                
-            # For BT Business Broadband, just click the submit button (no email/password fields)
-            try:
-                submit_selectors = [
-                    "//input[@id='submit-btb']",
-                    "//button[contains(text(), 'Click here to log in')]",
-                    "//input[@type='submit']",
-                    "//button[@type='submit']",
-                    "//button[contains(text(), 'Log in')]",
-                    "//button[contains(text(), 'Sign in')]",
-                    "//button[contains(text(), 'Login')]"
-                ]
-                
-                submit_clicked = False
-                for selector in submit_selectors:
-                    try:
-                        submit_button = wait.until(
-                            EC.element_to_be_clickable((By.XPATH, selector))
-                        )
-                        submit_button.click()
-                        self.logger.info(f"Clicked submit button using selector: {selector}")
-                        submit_clicked = True
-                        time.sleep(0.5)
-                        break
-                    except:
-                        continue
-                
-                if not submit_clicked:
+            self._wait_for_page_load(driver)
+            
+            # Accept cookies, click "Log in now", select the BT Business Broadband tab,
+            # then click the submit button (no email/password fields for BT Business)
+            before_url = driver.current_url
+            
+            # Click through the whole EE page in one script; drive each element
+            # from Selenium only if the script stops early
+            if self._run_click_sequence(driver, [
+                {'name': 'cookies', 'selectors': self._COOKIE_SELECTORS, 'timeout': 2000, 'required': False},
+                {'name': 'login', 'selectors': self._LOGIN_SELECTORS, 'timeout': 5000, 'required': False},
+                {'name': 'bt_tab', 'selectors': self._BT_TAB_SELECTORS, 'timeout': 5000, 'required': False},
+                {'name': 'submit', 'selectors': self._EE_SUBMIT_SELECTORS, 'timeout': 10000, 'required': True}
+            ]):
+                self.logger.info("Clicked through EE portal page")
+            else:
+                cookie_button = self._wait_first_visible(driver, self._COOKIE_SELECTORS, timeout=self._PROBE_TIMEOUT)
+                if cookie_button and self._try_click(cookie_button, "cookie acceptance button"):
+                    self._wait_until(driver, EC.invisibility_of_element(cookie_button))
+                    
+                login_button = self._wait_first_visible(driver, self._LOGIN_SELECTORS, timeout=5)
+                if login_button:
+                    self._try_click(login_button, "login button")
+                    
+                bt_tab = self._wait_first_visible(driver, self._BT_TAB_SELECTORS, timeout=5)
+                if bt_tab:
+                    self._try_click(bt_tab, "BT Business tab")
+                    
+                submit_button = self._wait_first_visible(driver, self._EE_SUBMIT_SELECTORS)
+                if not submit_button:
                     self.logger.error("Could not find submit button with any selector")
                     return False
                     
-            except Exception as e:
-                self.logger.error(f"Error clicking submit button: {e}")
+                submit_button.click()
+                self.logger.info("Clicked submit button")
+                
+            # Move on as soon as the BT sign-in page, a credential field or any
+            # other page shows up; a page that does none of these is stuck
+            if not self._wait_until(driver, EC.any_of(
+                    EC.url_contains("bt.com"),
+                    EC.url_contains("btbusiness"),
+                    EC.presence_of_element_located((By.CSS_SELECTOR, self._SIGN_IN_FIELD_CSS)),
+                    EC.url_changes(before_url))):
+                self.logger.error("Portal did not respond to the submit button")
                 return False
             
             # After clicking submit, wait for page to load and handle any additional steps
             self.logger.info("Waiting for page to load after submit...")
-            time.sleep(0.5)  # Reduced time for page transition
+            self._wait_for_page_load(driver)
             
             # Take another screenshot to see what page we're on now
-            try:
-                driver.save_screenshot("after_submit_debug.png")
-                self.logger.info("Screenshot saved as after_submit_debug.png")
-            except:
-                pass
+            self._debug_screenshot(driver, "after_submit_debug.png")
             
             # Check current URL to see if we were redirected
             current_url = driver.current_url
@@ -490,285 +1748,50 @@ class WiFiHotspotAgent:
                 self.logger.info("Redirected to BT login page - this is expected for BT Business")
                 
                 # Wait for the page to fully load
-                time.sleep(3)
-                
-                # Enhanced email field detection for BT OAuth2 pages
-                username_selectors = [
-                    # Standard input selectors
-                    "//input[@type='text' or @type='email' or @name='username' or @name='email' or @id='username' or @id='email']",
-                    "//input[@placeholder*='username' or @placeholder*='email' or @placeholder*='Username' or @placeholder*='Email']",
-                    # BT-specific selectors
-                    "//input[@name='loginfmt']",  # Microsoft/BT OAuth2 email field
-                    "//input[@id='loginfmt']",    # Microsoft/BT OAuth2 email field
-                    "//input[@name='email']",     # Generic email field
-                    "//input[@id='email']",       # Generic email field
-                    "//input[@type='email']",     # HTML5 email input
-                    "//input[contains(@class, 'email')]",  # Email class-based selector
-                    "//input[contains(@class, 'username')]", # Username class-based selector
-                    # More specific BT OAuth2 selectors
-                    "//input[@data-bind*='email']",
-                    "//input[@data-bind*='username']",
-                    "//input[@aria-label*='email' or @aria-label*='Email']",
-                    "//input[@aria-label*='username' or @aria-label*='Username']"
-                ]
+                self._wait_for_page_load(driver)
                 
-                username_filled = False
-                for selector in username_selectors:
-                    try:
-                        username_field = wait.until(
-                            EC.presence_of_element_located((By.XPATH, selector))
-                        )
-                        if username_field.is_displayed() and username_field.is_enabled():
-                            username_field.clear()
-                            username_field.send_keys(config['username'])
-                            self.logger.info(f"Filled username field: {selector}")
-                            username_filled = True
-                            time.sleep(1)
-                            break
-                    except:
-                        continue
-                
-                if username_filled:
-                    # Enhanced Next/Continue button detection for BT OAuth2 pages
-                    next_selectors = [
-                        # Standard button text selectors
-                        "//button[contains(text(), 'Next')]",
-                        "//button[contains(text(), 'Continue')]",
-                        "//button[contains(text(), 'Proceed')]",
-                        "//button[contains(text(), 'Sign in')]",
-                        "//button[contains(text(), 'Login')]",
-                        "//button[contains(text(), 'Submit')]",
-                        # BT/Microsoft OAuth2 specific selectors
-                        "//input[@type='submit']",
-                        "//button[@type='submit']",
-                        "//input[@value='Next']",
-                        "//input[@value='Continue']",
-                        "//input[@value='Sign in']",
-                        "//input[@value='Login']",
-                        # ID and class-based selectors
-                        "//button[@id='idSIButton9']",  # Microsoft OAuth2 Next button
-                        "//input[@id='idSIButton9']",   # Microsoft OAuth2 Next button
-                        "//button[contains(@class, 'btn-primary')]",
-                        "//button[contains(@class, 'btn-submit')]",
-                        "//button[contains(@class, 'next')]",
-                        "//button[contains(@class, 'continue')]",
-                        # Data attribute selectors
-                        "//button[@data-bind*='next']",
-                        "//button[@data-bind*='continue']",
-                        "//button[@data-bind*='submit']",
-                        # Aria-label selectors
-                        "//button[@aria-label*='Next' or @aria-label*='Continue']",
-                        "//input[@aria-label*='Next' or @aria-label*='Continue']",
-                        # Form submission selectors
-                        "//form//button[@type='submit']",
-                        "//form//input[@type='submit']"
-                    ]
-                    
-                    next_clicked = False
-                    for selector in next_selectors:
-                        try:
-                            next_button = wait.until(
-                                EC.element_to_be_clickable((By.XPATH, selector))
-                            )
-                            if next_button.is_displayed() and next_button.is_enabled():
-                                next_button.click()
-                                self.logger.info(f"Clicked Next button: {selector}")
-                                next_clicked = True
-                                time.sleep(0.5)
-                                break
-                        except:
-                            continue
-                    
-                    if not next_clicked:
-                        self.logger.warning("Could not find Next button, trying alternative approach...")
-                        # Try pressing Enter on the email field as fallback
-                        try:
-                            username_field.send_keys("\n")
-                            self.logger.info("Pressed Enter on email field as fallback")
-                            time.sleep(0.5)
-                        except:
-                            pass
-                    
-                    # Enhanced password field detection for BT OAuth2 pages
-                    password_selectors = [
-                        # Standard password selectors
-                        "//input[@type='password']",
-                        "//input[@name='password']",
-                        "//input[@id='password']",
-                        # BT/Microsoft OAuth2 specific selectors
-                        "//input[@name='passwd']",     # Microsoft OAuth2 password field
-                        "//input[@id='passwd']",       # Microsoft OAuth2 password field
-                        "//input[@name='pwd']",        # Alternative password field name
-                        "//input[@id='pwd']",          # Alternative password field ID
-                        # Class and attribute-based selectors
-                        "//input[contains(@class, 'password')]",
-                        "//input[contains(@class, 'pwd')]",
-                        "//input[@placeholder*='password' or @placeholder*='Password']",
-                        "//input[@aria-label*='password' or @aria-label*='Password']",
-                        # Data attribute selectors
-                        "//input[@data-bind*='password']",
-                        "//input[@data-bind*='pwd']"
-                    ]
-                    
-                    for selector in password_selectors:
-                        try:
-                            password_field = wait.until(
-                                EC.presence_of_element_located((By.XPATH, selector))
-                            )
-                            if password_field.is_displayed() and password_field.is_enabled():
-                                password_field.clear()
-                                password_field.send_keys(config['password'])
-                                self.logger.info(f"Filled password field: {selector}")
-                                time.sleep(1)
-                                
-                                # Enhanced final submit button detection for BT OAuth2 pages
-                                submit_selectors = [
-                                    # BT-specific: Next button is used for final submission
-                                    "//button[contains(text(), 'Next')]",
-                                    "//button[@id='next']",
-                                    "//input[@id='next']",
-                                    # Standard button text selectors
-                                    "//button[contains(text(), 'Sign in')]",
-                                    "//button[contains(text(), 'Login')]",
-                                    "//button[contains(text(), 'Submit')]",
-                                    "//button[contains(text(), 'Sign In')]",
-                                    "//button[contains(text(), 'Log In')]",
-                                    "//button[contains(text(), 'Continue')]",
-                                    # BT/Microsoft OAuth2 specific selectors
-                                    "//input[@type='submit']",
-                                    "//button[@type='submit']",
-                                    "//input[@value='Sign in']",
-                                    "//input[@value='Login']",
-                                    "//input[@value='Submit']",
-                                    "//input[@value='Continue']",
-                                    "//input[@value='Next']",
-                                    # ID and class-based selectors
-                                    "//button[@id='idSIButton9']",  # Microsoft OAuth2 submit button
-                                    "//input[@id='idSIButton9']",   # Microsoft OAuth2 submit button
-                                    "//button[contains(@class, 'btn-primary')]",
-                                    "//button[contains(@class, 'btn-submit')]",
-                                    "//button[contains(@class, 'btn-signin')]",
-                                    "//button[contains(@class, 'btn-login')]",
-                                    # Data attribute selectors
-                                    "//button[@data-bind*='submit']",
-                                    "//button[@data-bind*='signin']",
-                                    "//button[@data-bind*='login']",
-                                    # Aria-label selectors
-                                    "//button[@aria-label*='Sign in' or @aria-label*='Login']",
-                                    "//input[@aria-label*='Sign in' or @aria-label*='Login']",
-                                    # Form submission selectors
-                                    "//form//button[@type='submit']",
-                                    "//form//input[@type='submit']"
-                                ]
-                                
-                                for submit_selector in submit_selectors:
-                                    try:
-                                        submit_button = wait.until(
-                                            EC.element_to_be_clickable((By.XPATH, submit_selector))
-                                        )
-                                        submit_button.click()
-                                        self.logger.info(f"Clicked final submit button: {submit_selector}")
-                                        time.sleep(0.5)
-                                        break
-                                    except:
-                                        continue
-                                break
-                        except:
-                            continue
-                else:
-                    self.logger.warning("Could not find username field on redirected page")
+                # Same username / Next / password / submit steps as the direct OAuth2 flow
+                self._sign_in(driver, config, self._USERNAME_SELECTORS, self._NEXT_SELECTORS,
+                              self._PASSWORD_SELECTORS, self._FINAL_SUBMIT_SELECTORS)
             else:
                 # Still on EE WiFi page, look for additional login elements
                 self.logger.info("Still on EE WiFi page, looking for additional login elements...")
                 
-                additional_login_selectors = [
-                    "//input[@type='text' or @type='email' or @name='username' or @name='email']",
-                    "//input[@type='password']",
-                    "//button[contains(text(), 'Continue')]",
-                    "//button[contains(text(), 'Next')]",
-                    "//button[contains(text(), 'Proceed')]",
-                    "//button[contains(text(), 'Submit')]",
-                    "//input[@type='submit']",
-                    "//button[@type='submit']"
-                ]
+                # One lookup decides which kind of step this is, instead of waiting
+                # out a probe for each kind in turn. Kept in fixed order (no hit
+                # stats) so a field always wins over a button shown alongside it
+                match = self._wait_first_match(driver, self._EE_EXTRA_SELECTORS, timeout=self._PROBE_TIMEOUT)
+                selector = match['selector'] if match else None
                 
-                for selector in additional_login_selectors:
-                    try:
-                        element = wait.until(
-                            EC.presence_of_element_located((By.XPATH, selector))
-                        )
-                        if element.is_displayed() and element.is_enabled():
-                            self.logger.info(f"Found additional login element: {selector}")
-                            
-                            # If it's a username/email field, try to fill it
-                            if 'username' in selector or 'email' in selector or 'text' in selector:
-                                element.clear()
-                                element.send_keys(config['username'])
-                                self.logger.info("Filled username field")
-                                time.sleep(1)
-                                
-                                # Look for Next button
-                                next_button_selectors = [
-                                    "//button[contains(text(), 'Next')]",
-                                    "//button[contains(text(), 'Continue')]",
-                                    "//input[@type='submit']",
-                                    "//button[@type='submit']"
-                                ]
-                                
-                                for next_selector in next_button_selectors:
-                                    try:
-                                        next_button = wait.until(
-                                            EC.element_to_be_clickable((By.XPATH, next_selector))
-                                        )
-                                        next_button.click()
-                                        self.logger.info(f"Clicked Next button: {next_selector}")
-                                        time.sleep(1)
-                                        break
-                                    except:
-                                        continue
-                                continue
-
-                            # If it's a password field, try to fill it
-                            elif 'password' in selector:
-                                element.clear()
-                                element.send_keys(config['password'])
-                                self.logger.info("Filled password field")
-                                time.sleep(1)
-                                
-                                # Look for final submit button
-                                submit_button_selectors = [
-                                    "//button[contains(text(), 'Sign in')]",
-                                    "//button[contains(text(), 'Login')]",
-                                    "//button[contains(text(), 'Submit')]",
-                                    "//input[@type='submit']",
-                                    "//button[@type='submit']"
-                                ]
-                                
-                                for submit_selector in submit_button_selectors:
-                                    try:
-                                        submit_button = wait.until(
-                                            EC.element_to_be_clickable((By.XPATH, submit_selector))
-                                        )
-                                        submit_button.click()
-                                        self.logger.info(f"Clicked final submit button: {submit_selector}")
-                                        time.sleep(1)
-                                        break
-                                    except:
-                                        continue
-                                break
-
-                            # If it's a button, try to click it
-                            elif 'button' in selector:
-                                element.click()
-                                self.logger.info(f"Clicked additional button: {selector}")
-                                time.sleep(1)
-                                break
-                    except:
-                        continue
+                if selector in self._EE_USERNAME_SELECTORS:
+                    self._set_value(driver, match['el'], config['username'])
+                    self.logger.info("Filled username field")
+                    # Look for Next button
+                    if self._click_any(driver, self._EE_NEXT_SELECTORS, "Next button", timeout=self._PROBE_TIMEOUT):
+                        self._wait_for_page_load(driver)
+                    password_field = self._fill_field(driver, self._EE_PASSWORD_SELECTORS, config['password'],
+                                                      "password", timeout=self._PROBE_TIMEOUT)
+                elif selector in self._EE_PASSWORD_SELECTORS:
+                    password_field = match['el']
+                    self._set_value(driver, password_field, config['password'])
+                    self.logger.info("Filled password field")
+                else:
+                    password_field = None
+                    if match and self._try_click(match['el'], "additional button"):
+                        self._wait_for_page_load(driver)
+                    elif not match:
+                        self.logger.info("No additional login elements found")
+                        
+                if password_field:
+                    # Look for final submit button
+                    before_url = driver.current_url
+                    if self._click_any(driver, self._EE_FINAL_SUBMIT_SELECTORS, "final submit button",
+                                       timeout=self._PROBE_TIMEOUT):
+                        self._wait_until(driver, EC.url_changes(before_url))
                 
             # Final wait and verification
             self.logger.info("Final verification...")
-            time.sleep(0.5)
+            self._wait_for_page_load(driver)
             
             # Browser will be closed by the main handle_captive_portal method
             self.logger.info("Login process completed, browser will be closed...")
@@ -779,30 +1802,24 @@ class WiFiHotspotAgent:
             self.logger.error(f"Error in BT Business login: {e}")
             return False
             
-    def _handle_form_based_login(self, driver, wait, config) -> bool:
+    def _handle_form_based_login(self, driver, config) -> bool:
         """Handle form-based login."""
         try:
-            # Find username field
-            username_field = wait.until(
-                EC.presence_of_element_located((By.XPATH, "//input[@type='text' or @type='email' or @name='username' or @name='email']"))
-            )
-            username_field.clear()
-            username_field.send_keys(config['username'])
-            
-            # Find password field
-            password_field = wait.until(
-                EC.presence_of_element_located((By.XPATH, "//input[@type='password']"))
-            )
-            password_field.clear()
-            password_field.send_keys(config['password'])
-            
-            # Find and click submit button
-            submit_button = wait.until(
-                EC.element_to_be_clickable((By.XPATH, "//button[@type='submit'] | //input[@type='submit']"))
-            )
-            submit_button.click()
-            
-            time.sleep(5)
+            # Each lookup checks its whole selector list in one in-page query per poll
+            if not self._fill_field(driver, self._EE_USERNAME_SELECTORS, config['username'], "username"):
+                self.logger.error("Could not find username field")
+                return False
+                
+            if not self._fill_field(driver, self._EE_PASSWORD_SELECTORS, config['password'], "password"):
+                self.logger.error("Could not find password field")
+                return False
+                
+            before_url = driver.current_url
+            if not self._click_any(driver, self._FORM_SUBMIT_SELECTORS, "submit button"):
+                self.logger.error("Could not find submit button")
+                return False
+            
+            self._wait_until(driver, EC.url_changes(before_url))
             return self.check_internet_connectivity()
             
         except Exception as e:
@@ -814,243 +1831,84 @@ class WiFiHotspotAgent:
         self.logger.info(f"Handling direct BT authentication URL: {auth_url}")
         
         try:
-            # Setup Chrome driver with multiple fallback options
-            service = None
-            driver = None
-            
-            # Try multiple approaches to get Chrome driver
-            driver_attempts = [
-                self._try_local_driver,
-                self._try_webdriver_manager,
-                self._try_system_chromedriver,
-                self._try_chromedriver_in_path
-            ]
+            driver = self._get_or_create_driver()
             
-            for attempt_func in driver_attempts:
-                try:
-                    service = attempt_func()
-                    if service:
-                        break
-                except Exception as e:
-                    self.logger.debug(f"Driver attempt failed: {e}")
-                    continue
-            
-            if not service:
-                raise Exception("Could not initialize Chrome driver with any method")
-            
-            options = webdriver.ChromeOptions()
-            
-            # Always add these basic options
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-web-security')
-            options.add_argument('--allow-running-insecure-content')
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option('useAutomationExtension', False)
-            
-            if self.headless:
-                options.add_argument('--headless')
-                options.add_argument('--disable-gpu')
-                options.add_argument('--window-size=1920,1080')
-                options.add_argument('--disable-extensions')
-                options.add_argument('--disable-plugins')
-                options.add_argument('--disable-images')
-                options.add_argument('--disable-background-timer-throttling')
-                options.add_argument('--disable-backgrounding-occluded-windows')
-                options.add_argument('--disable-renderer-backgrounding')
-                options.add_argument('--disable-features=TranslateUI')
-                options.add_argument('--disable-ipc-flooding-protection')
-                options.add_argument('--hide-scrollbars')
-                options.add_argument('--mute-audio')
-                self.logger.info("Running browser in headless (invisible) mode")
-            else:
-                options.add_argument('--window-size=1200,800')
-                self.logger.info("Running browser in visible mode for debugging")
-            
-            driver = webdriver.Chrome(service=service, options=options)
-            wait = WebDriverWait(driver, 10)
-            
-            # Navigate directly to the authentication URL
-            driver.get(auth_url)
-            time.sleep(3)
-            
-            # Take a screenshot for debugging
+            # Let the page fill in the credentials itself while it renders
+            autofill_id = self._add_autofill_script(driver, urlsplit(auth_url).hostname, config)
             try:
-                driver.save_screenshot("bt_auth_debug.png")
-                self.logger.info("Screenshot saved as bt_auth_debug.png")
-            except:
-                pass
-            
-            # Handle the authentication flow
-            success = self._handle_bt_oauth2_flow(driver, wait, config)
+                # Navigate directly to the authentication URL
+                self._navigate(driver, auth_url)
+                self._wait_for_page_load(driver)
+                
+                # Take a screenshot for debugging
+                self._debug_screenshot(driver, "bt_auth_debug.png")
+                
+                # Handle the authentication flow
+                success = self._handle_bt_oauth2_flow(driver, config)
+            finally:
+                # The browser is shared, so the credentials must not follow it around
+                self._remove_autofill_script(driver, autofill_id)
             
-            driver.quit()
+            self._reset_driver()
             return success
             
         except Exception as e:
             self.logger.error(f"Error handling direct BT auth URL: {e}")
+            self._reset_driver()
             return False
     
-    def _handle_bt_oauth2_flow(self, driver, wait, config) -> bool:
-        """Handle BT OAuth2 authentication flow."""
+    def _add_autofill_script(self, driver, host: Optional[str], config: Dict) -> Optional[str]:
+        """Register _AUTOFILL_JS for new documents on host; returns its CDP identifier."""
+        if not host:
+            return None
+        source = self._AUTOFILL_JS % json.dumps({
+            'host': host,
+            'fields': [
+                {'selector': "input[name='loginfmt'], input#loginfmt, input[type='email']",
+                 'value': config['username']},
+                {'selector': "input[name='passwd'], input#passwd, input[type='password']",
+                 'value': config['password']},
+            ]
+        })
         try:
-            self.logger.info("Starting BT OAuth2 authentication flow")
+            result = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+            return result.get('identifier')
+        except WebDriverException as e:
+            self.logger.debug("Could not add autofill script: %s", e)
+            return None
             
-            # Wait for page to load
-            time.sleep(0.5)
-            
-            # Look for email field
-            email_selectors = [
-                "//input[@name='loginfmt']",     # Microsoft OAuth2 email field
-                "//input[@id='loginfmt']",       # Microsoft OAuth2 email field
-                "//input[@type='email']",        # HTML5 email input
-                "//input[@name='email']",        # Generic email field
-                "//input[@id='email']",          # Generic email field
-                "//input[@type='text' and contains(@placeholder, 'email')]",
-                "//input[@type='text' and contains(@placeholder, 'Email')]",
-                "//input[@type='text' and contains(@placeholder, 'username')]",
-                "//input[@type='text' and contains(@placeholder, 'Username')]"
-            ]
+    def _remove_autofill_script(self, driver, identifier: Optional[str]):
+        """Unregister a script added by _add_autofill_script."""
+        if identifier is None:
+            return
+        try:
+            driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": identifier})
+        except WebDriverException as e:
+            # Quit rather than leave a browser around that fills in credentials
+            self.logger.debug("Could not remove autofill script, closing browser: %s", e)
+            self._quit_driver()
             
-            email_filled = False
-            for selector in email_selectors:
-                try:
-                    email_field = wait.until(
-                        EC.presence_of_element_located((By.XPATH, selector))
-                    )
-                    if email_field.is_displayed() and email_field.is_enabled():
-                        email_field.clear()
-                        email_field.send_keys(config['username'])
-                        self.logger.info(f"Filled email field: {selector}")
-                        email_filled = True
-                        time.sleep(1)
-                        break
-                except:
-                    continue
+    def _handle_bt_oauth2_flow(self, driver, config) -> bool:
+        """Handle BT OAuth2 authentication flow."""
+        try:
+            self.logger.info("Starting BT OAuth2 authentication flow")
             
-            if not email_filled:
-                self.logger.error("Could not find email field")
+            # The autofill script has usually filled the fields already; setting
+            # them again costs no more than checking
+            if not self._sign_in(driver, config, self._OAUTH_EMAIL_SELECTORS, self._OAUTH_NEXT_SELECTORS,
+                                 self._OAUTH_PASSWORD_SELECTORS, self._OAUTH_SUBMIT_SELECTORS):
                 return False
             
-            # Look for Next button
-            next_selectors = [
-                "//input[@type='submit']",
-                "//button[@type='submit']",
-                "//input[@value='Next']",
-                "//button[contains(text(), 'Next')]",
-                "//input[@id='idSIButton9']",
-                "//button[@id='idSIButton9']"
-            ]
-            
-            next_clicked = False
-            for selector in next_selectors:
-                try:
-                    next_button = wait.until(
-                        EC.element_to_be_clickable((By.XPATH, selector))
-                    )
-                    if next_button.is_displayed() and next_button.is_enabled():
-                        next_button.click()
-                        self.logger.info(f"Clicked Next button: {selector}")
-                        next_clicked = True
-                        time.sleep(3)
-                        break
-                except:
-                    continue
-            
-            if not next_clicked:
-                self.logger.warning("Could not find Next button, trying Enter key...")
-                try:
-                    email_field.send_keys("\n")
-                    self.logger.info("Pressed Enter on email field")
-                    time.sleep(3)
-                except:
-                    pass
-            
-            # Now look for password field
-            password_selectors = [
-                "//input[@name='passwd']",       # Microsoft OAuth2 password field
-                "//input[@id='passwd']",         # Microsoft OAuth2 password field
-                "//input[@type='password']",     # Standard password field
-                "//input[@name='password']",     # Generic password field
-                "//input[@id='password']"        # Generic password field
-            ]
-            
-            password_filled = False
-            for selector in password_selectors:
-                try:
-                    password_field = wait.until(
-                        EC.presence_of_element_located((By.XPATH, selector))
-                    )
-                    if password_field.is_displayed() and password_field.is_enabled():
-                        password_field.clear()
-                        password_field.send_keys(config['password'])
-                        self.logger.info(f"Filled password field: {selector}")
-                        password_filled = True
-                        time.sleep(1)
-                        break
-                except:
-                    continue
-            
-            if not password_filled:
-                self.logger.error("Could not find password field")
-                return False
-            
-            # Look for final submit button
-            submit_selectors = [
-                # BT-specific: Next button is used for final submission
-                "//button[contains(text(), 'Next')]",
-                "//button[@id='next']",
-                "//input[@id='next']",
-                # Standard submit selectors
-                "//input[@type='submit']",
-                "//button[@type='submit']",
-                "//input[@value='Sign in']",
-                "//button[contains(text(), 'Sign in')]",
-                "//input[@id='idSIButton9']",
-                "//button[@id='idSIButton9']"
-            ]
-            
-            submit_clicked = False
-            for selector in submit_selectors:
-                try:
-                    submit_button = wait.until(
-                        EC.element_to_be_clickable((By.XPATH, selector))
-                    )
-                    if submit_button.is_displayed() and submit_button.is_enabled():
-                        submit_button.click()
-                        self.logger.info(f"Clicked submit button: {selector}")
-                        submit_clicked = True
-                        time.sleep(3)
-                        break
-                except:
-                    continue
-            
-            if not submit_clicked:
-                self.logger.warning("Could not find submit button, trying Enter key...")
-                try:
-                    password_field.send_keys("\n")
-                    self.logger.info("Pressed Enter on password field")
-                    time.sleep(3)
-                except:
-                    pass
-            
-            # Wait for authentication to complete
-            time.sleep(5)
-            
             # Check if we were redirected to a success page
             current_url = driver.current_url
             self.logger.info(f"Final URL after authentication: {current_url}")
             
             # Take final screenshot
-            try:
-                driver.save_screenshot("bt_auth_final.png")
-                self.logger.info("Final screenshot saved as bt_auth_final.png")
-            except:
-                pass
+            self._debug_screenshot(driver, "bt_auth_final.png")
             
             # Check if authentication was successful
-            if "error" not in current_url.lower() and "fail" not in current_url.lower():
+            url_lower = current_url.lower()
+            if not any(token in url_lower for token in self._FAILURE_URL_TOKENS):
                 self.logger.info("BT OAuth2 authentication appears successful")
                 return True
             else:
@@ -1061,64 +1919,89 @@ class WiFiHotspotAgent:
             self.logger.error(f"Error in BT OAuth2 flow: {e}")
             return False
 
-    def _handle_click_through_login(self, driver, wait) -> bool:
+    def _handle_click_through_login(self, driver) -> bool:
         """Handle click-through login (terms acceptance)."""
         try:
-            # Look for common terms acceptance buttons
-            button_texts = [
-                "Accept", "Agree", "Continue", "I Agree", "Accept Terms",
-                "Get Started", "Connect", "Login", "Sign In"
-            ]
-            
-            for text in button_texts:
-                try:
-                    button = wait.until(
-                        EC.element_to_be_clickable((By.XPATH, f"//button[contains(text(), '{text}')] | //a[contains(text(), '{text}')]"))
-                    )
-                    button.click()
-                    time.sleep(3)
-                    break
-                except:
-                    continue
+            # Look for common terms acceptance buttons; every candidate is checked
+            # in one in-page query per poll
+            button = self._wait_first_visible(driver, self._CLICK_THROUGH_XPATHS, timeout=5)
+            before_url = driver.current_url
+            if button and self._try_click(button, "terms acceptance button"):
+                # Move on as soon as the portal redirects rather than after a fixed pause
+                if self._wait_until(driver, EC.url_changes(before_url), timeout=8):
+                    self._wait_for_page_load(driver)
                     
-            time.sleep(5)
-            return self.check_internet_connectivity()
+            # The gateway may take a moment to let traffic through after accepting
+            deadline = time.monotonic() + 5
+            while not self.check_internet_connectivity():
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.5)
+            return True
             
         except Exception as e:
             self.logger.error(f"Error in click-through login: {e}")
             return False
             
     def run(self) -> bool:
-        """Main execution method."""
+        """Main execution method.
+        
+        Returns True once online; last_result tells the outcomes apart.
+        """
         self.logger.info("Starting WiFi Hotspot Agent")
+        self.last_result = RunResult.ERROR
         
-        # Check if already connected to internet
-        if self.check_internet_connectivity():
-            self.logger.info("Internet is already available")
-            return True
+        # Check if already connected to internet. A link that has only just come
+        # up (DHCP still settling) can fail the first check, and a couple of quick
+        # retries cost far less than starting a browser for nothing
+        for attempt in range(3):
+            if self.check_internet_connectivity():
+                self.logger.info("Internet is already available")
+                self.last_result = RunResult.ONLINE
+                return True
+            if attempt < 2:
+                time.sleep(0.5 * 2 ** attempt)
             
         # For Ethernet + AP setup, we don't need to connect to WiFi networks
         # The AP is already connected to EE WiFi, we just need to handle captive portal
         self.logger.info("Ethernet mode: Handling captive portal for AP router re-authentication")
         
-        # Try to handle captive portal for configured hotspots
-        for hotspot in self.config['hotspots']:
+        # Try to handle captive portal for configured hotspots. Behind the AP they
+        # all reach the same portal, so an entry that would repeat an earlier
+        # entry's login (same type, portal and account) is not tried again
+        tried_logins = set()
+        for hotspot in self._ordered_hotspots(self.config['hotspots']):
             ssid = hotspot['ssid']
             
             # Skip Profile network as it's not a hotspot
             if ssid == "Profile":
                 continue
                 
+            login = tuple(hotspot.get(key) for key in ('login_type', 'portal_url', 'username', 'password'))
+            if login in tried_logins:
+                self.logger.info(f"Skipping {ssid}: same login as a hotspot already tried")
+                continue
+            tried_logins.add(login)
+            
             self.logger.info(f"Attempting captive portal login for {ssid}")
             
             # Handle captive portal directly (AP is already connected to EE WiFi)
-            if self.handle_captive_portal(hotspot):
+            success = self.handle_captive_portal(hotspot)
+            self._record_hotspot_result(ssid, success)
+            if success:
                 self.logger.info(f"Successfully logged into {ssid} via captive portal")
+                self.last_result = RunResult.ONLINE
                 return True
             else:
                 self.logger.warning(f"Failed to login to {ssid} via captive portal")
                 
+        if not tried_logins:
+            self.logger.error("No hotspots configured to log in to")
+            self.last_result = RunResult.NO_HOTSPOT
+            return False
+            
         self.logger.error("No internet connection established via captive portal")
+        self.last_result = RunResult.LOGIN_FAILED
         return False
 
 
@@ -1128,17 +2011,29 @@ def main():
     
     parser = argparse.ArgumentParser(description='WiFi Hotspot Auto-Connect Agent')
     parser.add_argument('--config', default='wifi_config.json', help='Configuration file path')
-    parser.add_argument('--debug', action='store_true', help='Run browser in visible mode for debugging')
+    parser.add_argument('--debug', action='store_true', help='Run browser in visible mode and save screenshots for debugging')
     
     args = parser.parse_args()
     
     # Set headless mode: False for debug (visible), True for production (invisible)
     headless = not args.debug
     
-    agent = WiFiHotspotAgent(args.config, headless=headless)
-    success = agent.run()
+    agent = WiFiHotspotAgent(args.config, headless=headless, debug=args.debug or None)
+    try:
+        agent.run()
+    finally:
+        # One run per process here; long-lived callers keep the agent (and its browser)
+        agent.close()
     
-    sys.exit(0 if success else 1)
+    exit_code = int(agent.last_result)
+    if os.environ.get('FAST_EXIT') == '1':
+        # For frequent scheduled runs: the browser and threads are closed above,
+        # so once the log is flushed the interpreter teardown can be skipped
+        if _log_listener is not None:
+            _log_listener.stop()
+        logging.shutdown()
+        os._exit(exit_code)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":